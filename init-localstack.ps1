@@ -211,6 +211,7 @@ $stateMachineDefinition = @"
           "bucket.$": "`$.bucket",
           "key.$": "`$.key",
           "transformation_index": 2,
+          "input_key.$": "`$.step1_result.output_key",
           "transformation_config.$": "`$.transformation_config",
           "execution_id.$": "`$`$.Execution.Name"
         }
@@ -242,6 +243,7 @@ $stateMachineDefinition = @"
           "bucket.$": "`$.bucket",
           "key.$": "`$.key",
           "transformation_index": 3,
+          "input_key.$": "`$.step2_result.output_key",
           "transformation_config.$": "`$.transformation_config",
           "execution_id.$": "`$`$.Execution.Name"
         }
@@ -26,33 +26,71 @@ Expected Step Functions Event Structure:
     },
     "execution_id": "step-functions-execution-id"
 }
+
+Steps after the first also receive "input_key", the output_key returned by the
+previous step, so they can read its output without listing the step prefix.
+
+Batch mode: if the event carries "keys" (a list of XML object keys) instead of
+"key"/"transformation_index", every configured step is applied to each file in
+this one invocation, passing data between steps in memory. Only the final JSON
+is written, to the same location the last step would use in per-step mode.
+
+Warm containers: the storage client, the transformer orchestrator and the plugin
+instances it creates are built once per container and reused by every later
+invocation. Plugins must not carry request data from one invocation to the next;
+anything cached for an execution is reset when the execution_id in the context
+changes (see ReplicaMetadataTransformer).
 """
 
 import json
 import os
 import logging
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import Dict, Any
 
+import orjson
+from botocore.exceptions import ClientError
+
 # Add the src directory to path for imports
 repo_root = Path(__file__).resolve().parent
 sys.path.insert(0, str(repo_root))
 
-from src.generic_transformer import TransformerOrchestrator
-from src.storage import StorageClient, check_step_completed, load_json_from_prefix
+from src.main_transformer import TransformerOrchestrator
+from src.storage import (
+    StorageClient,
+    get_step_output,
+    key_stem,
+    load_json_from_prefix,
+    put_step_output,
+    step_output_key,
+)
 
-# Configure logger
+# Configure logger. Timestamps are raw epoch seconds: %(created) skips the
+# localtime/strftime work %(asctime) does on every record, and CloudWatch stamps lines anyway
 log_level = os.getenv("CTD_LOG_LEVEL", "INFO").upper()
 numeric_level = getattr(logging, log_level, logging.INFO)
 logging.basicConfig(
     level=numeric_level,
-    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    format='%(created).3f %(levelname)s %(name)s: %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-# Initialize storage client (auto-detects local vs S3)
-storage_client = StorageClient()
+# Initialize storage client (auto-detects local vs S3) and the transformer
+# orchestrator once per container so warm invocations reuse them; plugin instances
+# are reused too, so they must not keep request data (see the module docstring)
+storage_client = StorageClient.get()
+transformer = TransformerOrchestrator()
+
+# Indent final JSON output for debugging only; compact output is ~20% smaller and faster to write
+JSON_PRETTY = os.getenv("CTD_JSON_PRETTY", "0").lower() in ("1", "true", "y")
+JSON_DUMP_OPTIONS = orjson.OPT_INDENT_2 if JSON_PRETTY else 0
+
+# Batch-mode PUTs are submitted here so uploads overlap with transforming the next file;
+# every future is resolved before the handler returns
+_upload_pool = ThreadPoolExecutor(max_workers=4)
 
 
 def transformations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -64,17 +102,29 @@ def transformations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             - bucket: S3 bucket name
             - key: S3 object key (initial XML file path)
             - transformation_index: Current transformation step to execute
+            - input_key: Output key returned by the previous step (optional, steps > 1)
+            - keys: XML object keys to run through all steps (batch mode, replaces key/transformation_index)
             - transformation_config: Configuration for all transformations
             - execution_id: Step Functions execution ID
         context: Lambda context object
         
     Returns:
-        dict: Result containing statusCode, execution_id, output_key, and success_marker
+        dict: Result containing statusCode, execution_id and output_key
     """
-    logger.info("Lambda handler invoked")
-    logger.info("Event: %s", json.dumps(event, default=str))
+    logger.info(
+        "Lambda handler invoked (execution %s, step %s)",
+        event.get('execution_id'),
+        event.get('transformation_index')
+    )
+    # Serializing the whole event (including transformation_config) is only worth it when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Event: %s", orjson.dumps(event, default=str).decode('utf-8'))
     
+    input_path = None
     try:
+        if 'keys' in event:
+            return _run_batch(event)
+        
         # Extract event parameters
         bucket = event['bucket']
         initial_key = event['key']
@@ -104,38 +154,46 @@ def transformations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             input_key = initial_key
             logger.info("Step 1: Reading from initial input: %s", input_key)
             
-            # Read XML from storage
-            input_bytes = storage_client.get_object(bucket, input_key)
-            input_data = input_bytes.decode('utf-8')
-            logger.info("Loaded XML input (%d bytes)", len(input_data))
+            # Stream the XML to /tmp and hand the converter the path, so the document
+            # is never held in memory as bytes alongside the parsed tree
+            input_path = _input_path(execution_id)
+            storage_client.download_to_file(bucket, input_key, input_path)
+            input_data = input_path
+            logger.info("Downloaded XML input (%d bytes)", input_path.stat().st_size)
             
         else:
-            # Subsequent steps: read from previous step's output
+            # Subsequent steps: Step Functions only invokes this step once the
+            # previous step has returned 200, so its output can be read directly.
             previous_step = transformation_index - 1
-            input_prefix = f"processed/{execution_id}/step_{previous_step}/"
+            previous_output_key = event.get('input_key')
             
-            logger.info("Step %d: Checking previous step %d at %s", 
-                       transformation_index, previous_step, input_prefix)
+            if previous_output_key:
+                logger.info("Step %d: Reading step %d output: %s",
+                           transformation_index, previous_step, previous_output_key)
+                input_data = get_step_output(storage_client, bucket, previous_output_key)
+            else:
+                # The previous step's key is deterministic, so read it directly rather than
+                # listing the prefix; listing is only a fallback (e.g. sharded outputs)
+                filename = key_stem(initial_key)
+                expected_key = step_output_key(_intermediate_key_base(execution_id, previous_step, filename))
+                logger.info("Step %d: Reading step %d output: %s",
+                           transformation_index, previous_step, expected_key)
+                try:
+                    input_data = get_step_output(storage_client, bucket, expected_key)
+                except (FileNotFoundError, ClientError) as e:
+                    if isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                        raise
+                    input_prefix = f"processed/{execution_id}/step_{previous_step}/"
+                    logger.info("Step %d: %s not found, reading step %d output from %s",
+                               transformation_index, expected_key, previous_step, input_prefix)
+                    input_data = load_json_from_prefix(storage_client, bucket, input_prefix)
             
-            # Check if previous step completed
-            if not check_step_completed(storage_client, bucket, input_prefix):
-                logger.warning("Step %d not yet complete", previous_step)
-                return {
-                    "statusCode": 202,  # Accepted but not ready
-                    "message": f"Waiting for step {previous_step} to complete",
-                    "execution_id": execution_id,
-                    "transformation_index": transformation_index
-                }
-            
-            # Load JSON from previous step
-            input_data = load_json_from_prefix(storage_client, bucket, input_prefix)
             if not input_data:
                 raise ValueError(f"No output found from step {previous_step}")
             
-            logger.info("Loaded JSON from step %d", previous_step)
+            logger.info("Loaded output from step %d", previous_step)
         
         # Execute transformation
-        transformer = TransformerOrchestrator()
         transformation_context = {
             'storage_client': storage_client,
             'bucket': bucket,
@@ -147,31 +205,45 @@ def transformations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         output_data = transformer.transform(input_data, config, transformation_context)
         logger.info("Transformation completed successfully")
         
-        # Determine output location
-        filename = os.path.splitext(os.path.basename(initial_key))[0]
+        # Determine output location and format. Intermediate steps are only read back by
+        # the next step, so they use the CTD_INTERCHANGE format (MessagePack by default);
+        # the final step emits JSON.
+        filename = key_stem(initial_key)
         output_prefix = f"processed/{execution_id}/step_{transformation_index}/"
-        output_key = f"{output_prefix}{filename}.json"
-        success_marker = f"{output_prefix}_SUCCESS"
-        
-        # Write output to storage
-        logger.info("Writing output to: %s", output_key)
-        storage_client.put_object(
-            bucket,
-            output_key,
-            json.dumps(output_data, indent=2),
-            'application/json'
-        )
+        is_final_step = transformation_index == max(int(k) for k in transformation_config)
+        # Completion travels on the output object itself, so a single HEAD shows its status
+        step_metadata = _step_metadata(transformation_index)
         
-        # Write success marker
-        logger.info("Writing success marker: %s", success_marker)
-        storage_client.put_object(
-            bucket,
-            success_marker,
-            '',
-            'text/plain'
-        )
+        if is_final_step:
+            # orjson emits compact UTF-8 bytes directly, so no str -> bytes encode is needed
+            output_key = f"{output_prefix}{filename}.json"
+            storage_client.put_object(
+                bucket,
+                output_key,
+                orjson.dumps(output_data, option=JSON_DUMP_OPTIONS),
+                'application/json',
+                metadata=step_metadata
+            )
+        else:
+            # Intermediate outputs are gzip-compressed; catalogue records compress 5-10x
+            output_key = put_step_output(
+                storage_client,
+                bucket,
+                _intermediate_key_base(execution_id, transformation_index, filename),
+                output_data,
+                metadata=step_metadata
+            )
+        logger.info("Wrote output to: %s", output_key)
         
-        logger.info("Step %d completed successfully", transformation_index)
+        # Step Functions chains on the returned output_key, so completion is recorded
+        # in the logs (queryable in CloudWatch) rather than with an S3 marker object
+        logger.info(
+            "STEP_COMPLETE execution_id=%s step=%d operation=%s output_key=%s",
+            execution_id,
+            transformation_index,
+            operation,
+            output_key
+        )
         
         return {
             "statusCode": 200,
@@ -179,7 +251,6 @@ def transformations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             "transformation_index": transformation_index,
             "operation": operation,
             "output_key": output_key,
-            "success_marker": success_marker,
             "message": f"Step {transformation_index} completed successfully"
         }
         
@@ -192,6 +263,99 @@ def transformations(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             "execution_id": event.get('execution_id'),
             "transformation_index": event.get('transformation_index')
         }
+    finally:
+        # /tmp persists across warm invocations, so don't leave inputs behind
+        if input_path is not None:
+            input_path.unlink(missing_ok=True)
+
+
+def _intermediate_key_base(execution_id: str, step: int, filename: str) -> str:
+    """Key of an intermediate step output without extension (see put_step_output)."""
+    return f"processed/{execution_id}/step_{step}/{filename}"
+
+
+def _step_metadata(step: int) -> Dict[str, str]:
+    """S3 user metadata marking an object as the successful output of a step."""
+    return {'step-status': 'success', 'step': str(step)}
+
+
+def _input_path(execution_id: str) -> Path:
+    """Local temporary path a step 1 XML input is downloaded to."""
+    return Path(tempfile.gettempdir()) / f"{execution_id}_in.xml"
+
+
+def _run_batch(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run every configured step over each input key within a single invocation.
+    
+    Args:
+        event: Event containing bucket, keys, transformation_config and execution_id
+        
+    Returns:
+        dict: Result containing statusCode, execution_id and output_keys
+    """
+    bucket = event['bucket']
+    keys = event['keys']
+    transformation_config = event['transformation_config']
+    execution_id = event['execution_id']
+    
+    step_numbers = sorted(int(k) for k in transformation_config)
+    final_step = step_numbers[-1]
+    logger.info(
+        "Batch mode: %d file(s) through %d step(s) for execution %s",
+        len(keys),
+        len(step_numbers),
+        execution_id
+    )
+    
+    pipeline = transformer.compile_pipeline(transformation_config)
+    
+    uploads = []
+    try:
+        for key in keys:
+            transformation_context = {
+                'storage_client': storage_client,
+                'bucket': bucket,
+                'execution_id': execution_id
+            }
+            input_path = _input_path(execution_id)
+            try:
+                storage_client.download_to_file(bucket, key, input_path)
+                data = pipeline(input_path, transformation_context)
+            finally:
+                input_path.unlink(missing_ok=True)
+            
+            filename = key_stem(key)
+            output_key = f"processed/{execution_id}/step_{final_step}/{filename}.json"
+            # Upload in the background while the next file is transformed
+            uploads.append((output_key, _upload_pool.submit(
+                storage_client.put_object,
+                bucket,
+                output_key,
+                orjson.dumps(data, option=JSON_DUMP_OPTIONS),
+                'application/json',
+                metadata=_step_metadata(final_step)
+            )))
+    finally:
+        # Resolve every PUT before leaving, even when a later file fails, so none is
+        # left running when the container is frozen and no upload error goes unlogged
+        wait([upload for _, upload in uploads])
+        for output_key, upload in uploads:
+            if upload.exception() is not None:
+                logger.error("Failed to write %s: %s", output_key, upload.exception())
+    
+    output_keys = []
+    for output_key, upload in uploads:
+        upload.result()
+        output_keys.append(output_key)
+        logger.info("Wrote output to: %s", output_key)
+    
+    return {
+        "statusCode": 200,
+        "execution_id": execution_id,
+        "output_keys": output_keys,
+        "message": f"Processed {len(keys)} file(s) through {len(step_numbers)} step(s)"
+    }
 
 
 # For local testing
@@ -8,7 +8,7 @@
     1. Setting up local S3 bucket structure
     2. Uploading test XML file
     3. Calling Lambda for each transformation step
-    4. Checking for _SUCCESS markers
+    4. Passing each step's output key to the next step
     5. Verifying outputs
 
 .PARAMETER TestFile
@@ -92,7 +92,8 @@ function Invoke-LocalLambda {
         [int]$TransformationIndex,
         [string]$InputKey,
         [hashtable]$Config,
-        [string]$ExecId
+        [string]$ExecId,
+        [string]$PreviousOutputKey
     )
 
     $event = @{
@@ -102,6 +103,9 @@ function Invoke-LocalLambda {
         transformation_config = $Config
         execution_id = $ExecId
     }
+    if ($PreviousOutputKey) {
+        $event.input_key = $PreviousOutputKey
+    }
 
     $eventJson = $event | ConvertTo-Json -Depth 10
     
@@ -119,9 +123,6 @@ function Invoke-LocalLambda {
         
         if ($response.statusCode -eq 200) {
             Write-Host "  Output: $($response.output_key)" -ForegroundColor Green
-            Write-Host "  Success Marker: $($response.success_marker)" -ForegroundColor Green
-        } elseif ($response.statusCode -eq 202) {
-            Write-Host "  Message: $($response.message)" -ForegroundColor Yellow
         } else {
             Write-Host "  Error: $($response.error)" -ForegroundColor Red
         }
@@ -184,7 +185,7 @@ if (-not $step1Result -or $step1Result.statusCode -ne 200) {
 }
 
 # Step 2: Newline to <p>
-$step2Result = Invoke-LocalLambda -TransformationIndex 2 -InputKey $initialKey -Config $transformationConfig -ExecId $ExecutionId
+$step2Result = Invoke-LocalLambda -TransformationIndex 2 -InputKey $initialKey -Config $transformationConfig -ExecId $ExecutionId -PreviousOutputKey $step1Result.output_key
 
 if (-not $step2Result -or $step2Result.statusCode -ne 200) {
     Write-Host "Pipeline FAILED at Step 2" -ForegroundColor Red
@@ -192,7 +193,7 @@ if (-not $step2Result -or $step2Result.statusCode -ne 200) {
 }
 
 # Step 3: Y naming
-$step3Result = Invoke-LocalLambda -TransformationIndex 3 -InputKey $initialKey -Config $transformationConfig -ExecId $ExecutionId
+$step3Result = Invoke-LocalLambda -TransformationIndex 3 -InputKey $initialKey -Config $transformationConfig -ExecId $ExecutionId -PreviousOutputKey $step2Result.output_key
 
 if (-not $step3Result -or $step3Result.statusCode -ne 200) {
     Write-Host "Pipeline FAILED at Step 3" -ForegroundColor Red
@@ -1,6 +1,6 @@
-import boto3
 import sys
 import json
+import orjson
 import os
 import logging
 import tempfile
@@ -10,8 +10,10 @@ from dotenv import load_dotenv
 from datetime import datetime
 import time
 import tarfile
+import gzip
 import io
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 repo_root = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(repo_root))
@@ -20,6 +22,8 @@ from src.config_loader import UniversalConfig
 from src.utils import find_key, merge_xml_files, log_timing, _load_json_file, filter_xml_by_iaid
 from src.utils import load_transfer_register, save_transfer_register, filter_new_records, update_transfer_register_with_records
 from src.utils import insert_ordered, progress_context, get_trans_config
+from src.aws_clients import get_s3
+from src.storage import S3MultipartWriter, key_stem
 from src.transformers import NewlineToPTransformer, YNamingTransformer, ReplicaDataTransformer, convert_to_json
 
 
@@ -38,15 +42,26 @@ run_mode = os.getenv("RUN_MODE", "remote_s3").strip().lower()
 # verbose print statements on progress for long-running batches of records
 VERBOSE_PROGRESS = os.getenv("PROGRESS_VERBOSE", "0").lower() in ("1","true","y")
 
+# indent JSON written into tarballs for debugging only; compact output is smaller and faster
+JSON_PRETTY = os.getenv("CTD_JSON_PRETTY", "0").lower() in ("1","true","y")
+JSON_DUMP_OPTIONS = orjson.OPT_INDENT_2 if JSON_PRETTY else 0
+
+# gzip level for tarballs; level 1 is several times faster than the default 9 for a small size cost
+TARBALL_GZIP_LEVEL = int(os.getenv("TARBALL_GZIP_LEVEL", "1"))
+
+# threads used to build level tarballs and upload them; gzip and S3 I/O release the GIL
+TARBALL_WORKERS = int(os.getenv("TARBALL_WORKERS", "4"))
+
 if run_mode not in VALID_RUN_MODES:
     raise ValueError(
         f"Invalid RUN_MODE '{run_mode}'. Must be one of: {', '.join(VALID_RUN_MODES)}"
     )
 
-# Configure module logger (level can be set with CTD_LOG_LEVEL env var)
+# Configure module logger (level can be set with CTD_LOG_LEVEL env var); epoch timestamps
+# avoid per-record strftime, the local log file keeps human-readable times
 _log_level = os.getenv("CTD_LOG_LEVEL", "DEBUG").upper()
 _numeric_level = getattr(logging, _log_level, logging.INFO)
-logging.basicConfig(level=_numeric_level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logging.basicConfig(level=_numeric_level, format='%(created).3f %(levelname)s %(name)s: %(message)s')
 logger = logging.getLogger(__name__)
 
 # S3 client configuration based on run mode
@@ -55,12 +70,11 @@ if run_mode == "local_s3":
     aws_profile = os.getenv("AWS_PROFILE")
     if not aws_profile:
         raise ValueError("RUN_MODE='local_s3' requires AWS_PROFILE environment variable")
-    session = boto3.Session(profile_name=aws_profile)
-    s3 = session.client('s3')
+    s3 = get_s3(profile_name=aws_profile)
     logger.info("Using S3 with AWS profile: %s", aws_profile)
 elif run_mode == "remote_s3":
     # AWS Lambda/remote execution: uses IAM execution role
-    s3 = boto3.client('s3')
+    s3 = get_s3()
     logger.info("Using S3 with IAM execution role")
 else:
     # local mode: no S3 client needed
@@ -237,7 +251,7 @@ def lambda_handler(event, context):
     replica_list = []
     for page in page_iterator:
         replica_list.append(page.get('Contents', []))
-    replica_metadata_filenames = set([Path(obj['Key']).stem for sublist in replica_list for obj in sublist])
+    replica_metadata_filenames = {key_stem(obj['Key']) for sublist in replica_list for obj in sublist}
 
     # list filenames in files folder
     paginator_files = s3.get_paginator('list_objects_v2')
@@ -257,7 +271,7 @@ def lambda_handler(event, context):
             # Only process if it's in the format folder/filename
             if len(parts) == 3 and parts[1]:  # Avoid empty filenames
                 folder = parts[1]
-                filename = os.path.splitext(parts[2])[0]
+                filename = parts[2].rpartition('.')[0] or parts[2]
                 replica_filedata[folder].append(filename)
 
 
@@ -356,14 +370,14 @@ def lambda_handler(event, context):
     # 3. Load the converted JSON (convert_xml_to_json should have written it)
     converted_xml_to_json_files = records 
 
-    # save the converted files to disk to investigation if option selected
+    # save the converted files to disk to investigation if option selected (orjson writes the
+    # UTF-8 bytes in one go; set CTD_JSON_PRETTY for indented output)
     save_intermediate = os.getenv("DEBUG_TRANSFORMERS", "true").strip().lower() in truthy_chars
     if save_intermediate and run_mode == "local":
         for filename, _file in converted_xml_to_json_files.items():
             output_file = intermediate_dir / f"{filename}.json"
             try:
-                with output_file.open("w", encoding="utf-8") as fh:
-                    json.dump(_file, fh, ensure_ascii=False, indent=2)
+                output_file.write_bytes(orjson.dumps(_file, option=JSON_DUMP_OPTIONS))
             except Exception as exc:
                 print(f"Error writing transformed json to {output_file}: {exc}")
 
@@ -387,6 +401,32 @@ def lambda_handler(event, context):
         jsons_by_level_normal = {}  # {level_name: [(filename, json_dict), ...]}
         jsons_by_level_digitised = {}
         replica_filedata_count = 0
+
+        # Build the transformers once; their patterns and lookups are reused for every record
+        try:
+            task = transformation_config['tasks'].get('newline_to_p', {})
+            npt = NewlineToPTransformer(target_columns=task.get('target_columns'),
+                                      **task.get('params', {}))
+
+            task = transformation_config['tasks'].get('y_naming')
+            yt = YNamingTransformer(target_columns=task.get('target_columns'))
+            # set definitive refs on the transformer instance if we loaded them above
+            try:
+                if pipeline_valid_refs:
+                    yt.set_definitive_refs(pipeline_valid_refs)
+                    logger.debug("Set definitive refs on YNamingTransformer (count=%s)", None if yt._refs is None else len(yt._refs))
+            except Exception:
+                logger.exception("Failed to set definitive refs on YNamingTransformer instance")
+
+            rtd = ReplicaDataTransformer(bucket_name=bucket,
+                                            prefix=replica_metadata_prefix,
+                                            s3_client=s3 if run_mode in ["local_s3", "remote_s3"] else None)
+        except Exception:
+            logger.exception("Error setting up transformers")
+            result = {"status": "error", "message": "Error setting up transformers"}
+            logger.info("Pipeline result: %s", json.dumps(result))
+            return result
+
         logger.info("Applying transformations to %d JSON files...", len(converted_xml_to_json_files))
         with progress_context(total = len(converted_xml_to_json_files), interval=100, label="Transforming") as tick:
             for i, (filename, _file) in enumerate(converted_xml_to_json_files.items(), start=1): #filename = iaid
@@ -417,38 +457,24 @@ def lambda_handler(event, context):
                         pre_transform_dir = intermediate_dir / "pre_transformed"
                         pre_transform_dir.mkdir(parents=True, exist_ok=True)
                         pre_transform_file = pre_transform_dir / f"{filename}.json"
-                        with pre_transform_file.open("w", encoding="utf-8") as fh:
-                            json.dump(_file, fh, ensure_ascii=False, indent=2)
+                        pre_transform_file.write_bytes(orjson.dumps(_file, option=JSON_DUMP_OPTIONS))
                         logger.debug("Saved pre-transformed JSON: %s", pre_transform_file)
 
                     # debugging - filter by json pre and post transformation and print to console
+                    # only the description is compared, so copy that rather than the whole record
                     if filename == filter_iaid:
                         import copy
-                        data_before = copy.deepcopy(_file)
+                        before_desc = copy.deepcopy(_file.get('record', {}).get('scopeContent', {}).get('description'))
 
                     # newline to <p> transformation
-                    transformed_json = None
-                    task = transformation_config['tasks'].get('newline_to_p', {})
-                    npt = NewlineToPTransformer(target_columns=task.get('target_columns'),
-                                              **task.get('params', {}))
                     transformed_json = npt.transform(_file)
 
                     # Y naming transformation
-                    task = transformation_config['tasks'].get('y_naming')
-                    yt = YNamingTransformer(target_columns=task.get('target_columns'))
-                    # set definitive refs on the transformer instance if we loaded them above
-                    try:
-                        if pipeline_valid_refs:
-                            yt.set_definitive_refs(pipeline_valid_refs)
-                            logger.debug("Set definitive refs on YNamingTransformer (count=%s)", None if yt._refs is None else len(yt._refs))
-                    except Exception:
-                        logger.exception("Failed to set definitive refs on YNamingTransformer instance")
                     transformed_json = yt.transform(transformed_json)
 
                     # filter on record and print to console to see before and after effect of transformations
                     # set to none in .env (or current config file) to turn off
                     if filter_iaid is not None and filename == filter_iaid:
-                        before_desc = data_before.get('record', {}).get('scopeContent', {}).get('description')
                         after_desc = transformed_json.get('record', {}).get('scopeContent', {}).get('description')
 
                         import pprint as pp
@@ -479,9 +505,6 @@ def lambda_handler(event, context):
 
                         # now process replica metadata if available
                         if filename in replica_metadata_filenames:
-                            rtd = ReplicaDataTransformer(bucket_name=bucket,
-                                                            prefix=replica_metadata_prefix,
-                                                            s3_client=s3 if run_mode in ["local_s3", "remote_s3"] else None)
                             transformed_json = rtd.transform(transformed_json)
                             replica_iaids_added.append(filename)
 
@@ -502,8 +525,7 @@ def lambda_handler(event, context):
                         post_transform_dir = intermediate_dir / "post_transformed"
                         post_transform_dir.mkdir(parents=True, exist_ok=True)
                         post_transform_file = post_transform_dir / f"{filename}.json"
-                        with post_transform_file.open("w", encoding="utf-8") as fh:
-                            json.dump(transformed_json, fh, ensure_ascii=False, indent=2)
+                        post_transform_file.write_bytes(orjson.dumps(transformed_json, option=JSON_DUMP_OPTIONS))
                         logger.debug("Saved post-transformed JSON: %s", post_transform_file)
 
                     # Save the final transformed JSON
@@ -586,8 +608,39 @@ def lambda_handler(event, context):
             # Batch files per level into tarballs of up to 10,000 JSON files each
             BATCH_SIZE = 10000
 
-            def _create_level_tarballs(map_dict, suffix=""):
+            def _build_chunk_tarball(level_name, suffix, chunk, cumulative_count):
+                # Name tarball with cumulative end count: <tree>_<level>_N[_suffix].tar.gz
+                tarball_name = f"{tree_name}_{level_name}_{cumulative_count}{suffix}.tar.gz"
+
+                buf = io.BytesIO()
+                with tarfile.open(fileobj=buf, mode="w:gz", compresslevel=TARBALL_GZIP_LEVEL) as tar:
+                    # Members share one mtime, taken once per tarball rather than per file
+                    mtime = int(time.time())
+                    for filename, json_data in chunk:
+                        json_bytes = orjson.dumps(json_data, option=JSON_DUMP_OPTIONS)
+                        ti = tarfile.TarInfo(name=f"{filename.rpartition('/')[2]}.json")
+                        ti.size = len(json_bytes)
+                        ti.mtime = mtime
+                        # BytesIO over bytes shares the buffer until written to, so this is no copy
+                        tar.addfile(ti, fileobj=io.BytesIO(json_bytes))
+
+                tar_bytes = buf.getvalue()
+                logger.info("Created in-memory tarball: %s (%d files, %d bytes)",
+                            tarball_name, len(chunk), len(tar_bytes))
+
+                # Write tar by folder in local mode for convenience
+                if run_mode == "local":
+                    tarball_path = Path(output_dir) / tarball_name
+                    with tarball_path.open("wb") as f:
+                        f.write(tar_bytes)
+                    logger.info("Saved tarball locally: %s", tarball_path)
+
+                return f"{level_name}{suffix}", tarball_name, tar_bytes
+
+            def _submit_level_tarballs(pool, map_dict, suffix=""):
                 # suffix should include leading underscore if desired (e.g. "_digitised")
+                # returns {future: (level_name, chunk_index)} in submission order
+                futures = {}
                 for level_name, files in map_dict.items():
                     total_files = len(files)
                     logger.info("Level '%s'%s has %d files; batching into %d-file chunks",
@@ -599,52 +652,29 @@ def lambda_handler(event, context):
 
                     for chunk_index, chunk in enumerate(chunks, start=1):
                         cumulative_count += len(chunk)
-                        # Name tarball with cumulative end count: <tree>_<level>_N[_suffix].tar.gz
-                        tarball_name = f"{tree_name}_{level_name}_{cumulative_count}{suffix}.tar.gz"
-
-                        buf = io.BytesIO()
-                        try:
-                            with tarfile.open(fileobj=buf, mode="w:gz") as tar:
-                                for filename, json_data in chunk:
-                                    safe_name = f"{Path(filename).name}.json"
-                                    json_bytes = json.dumps(json_data, ensure_ascii=False, indent=2).encode("utf-8")
-                                    ti = tarfile.TarInfo(name=safe_name)
-                                    ti.size = len(json_bytes)
-                                    ti.mtime = int(time.time())
-                                    tar.addfile(ti, fileobj=io.BytesIO(json_bytes))
-
-                            buf.seek(0)
-                            tar_bytes = buf.getvalue()
-                            file_count = len(chunk)
-                            logger.info("Created in-memory tarball: %s (%d files, %d bytes)",
-                                        tarball_name, file_count, len(tar_bytes))
-
-                            level_key = f"{level_name}{suffix}"
-                            if level_key not in level_tarballs:
-                                level_tarballs[level_key] = []
-                            level_tarballs[level_key].append((tarball_name, tar_bytes))
-
-                            # Write tar by folder in local mode for convenience
-                            if run_mode == "local":
-                                tarball_path = Path(output_dir) / tarball_name
-                                with tarball_path.open("wb") as f:
-                                    f.write(tar_bytes)
-                                logger.info("Saved tarball locally: %s", tarball_path)
-
-                        except Exception:
-                            logger.exception("Error creating tarball for level %s (chunk %d)", level_name, chunk_index)
-                            result = {"status": "error", "message": f"Error creating tarball for level {level_name} chunk {chunk_index}"}
-                            logger.info("Pipeline result: %s", json.dumps(result))
-                            raise
-
-            # Build tarballs for normal and digitised sets
-            try:
-                _create_level_tarballs(jsons_by_level_normal, suffix="")
-                _create_level_tarballs(jsons_by_level_digitised, suffix="_digitised")
-            except Exception:
-                return_result = {"status": "error", "message": "Failed to create one or more tarballs"}
-                logger.info("Pipeline result: %s", json.dumps(return_result))
-                return return_result
+                        future = pool.submit(_build_chunk_tarball, level_name, suffix, chunk, cumulative_count)
+                        futures[future] = (level_name, chunk_index)
+                return futures
+
+            # Build tarballs for normal and digitised sets, chunks in parallel
+            with ThreadPoolExecutor(max_workers=TARBALL_WORKERS) as tar_pool:
+                chunk_futures = _submit_level_tarballs(tar_pool, jsons_by_level_normal, suffix="")
+                chunk_futures.update(_submit_level_tarballs(tar_pool, jsons_by_level_digitised, suffix="_digitised"))
+                for future in as_completed(chunk_futures):
+                    if future.exception() is not None:
+                        level_name, chunk_index = chunk_futures[future]
+                        logger.error("Error creating tarball for level %s (chunk %d)", level_name, chunk_index,
+                                     exc_info=future.exception())
+                        for pending in chunk_futures:
+                            pending.cancel()
+                        return_result = {"status": "error", "message": "Failed to create one or more tarballs"}
+                        logger.info("Pipeline result: %s", json.dumps(return_result))
+                        return return_result
+
+            # Collect in submission order so the super-tarball layout is deterministic
+            for future in chunk_futures:
+                level_key, tarball_name, tar_bytes = future.result()
+                level_tarballs.setdefault(level_key, []).append((tarball_name, tar_bytes))
 
             # Upload to S3 in S3 modes (local_s3 or remote_s3)
             if not bucket:
@@ -656,38 +686,42 @@ def lambda_handler(event, context):
             logger.info("Creating super-tarball: %s with %d level tarballs",
                         super_tarball_name, len(level_tarballs))
 
-            # Create super-tarball containing all level tarballs
-            super_buf = io.BytesIO()
-            with tarfile.open(fileobj=super_buf, mode="w:gz") as super_tar:
-                # level_tarballs maps level_key -> list of (tar_name, tar_bytes)
-                for level_key, tar_entries in level_tarballs.items():
-                    for tar_name, tar_bytes in tar_entries:
-                        ti = tarfile.TarInfo(name=tar_name)
-                        ti.size = len(tar_bytes)
-                        ti.mtime = int(time.time())
-                        super_tar.addfile(ti, fileobj=io.BytesIO(tar_bytes))
-                        logger.info("Added %s to super-tarball (%d bytes)", tar_name, len(tar_bytes))
-
-            super_buf.seek(0)
-            super_tar_bytes = super_buf.getvalue()
-            logger.info("Created super-tarball: %s (%d bytes)", super_tarball_name, len(super_tar_bytes))
-
             # Upload to json_outputs folder in S3, creating a subfolder for the supertar
             folder_name = tree_name  # Use tree_name as the folder name
             folder_key = f"{output_prefix}/{folder_name}/"
 
             # Upload the supertar into the folder and then each contained sub-tar
             tar_key = f"{folder_key}{super_tarball_name}"
+            upload_pool = ThreadPoolExecutor(max_workers=TARBALL_WORKERS)
             try:
-                s3.put_object(Bucket=bucket, Key=tar_key, Body=super_tar_bytes)
-                logger.info("Uploaded supertar to s3://%s/%s", bucket, tar_key)
-
-                # Upload each contained level tarball
+                # Upload each contained level tarball in the background while the super-tarball streams
+                subtar_uploads = []
                 for level_key, tar_entries in level_tarballs.items():
                     for tar_name, tar_bytes in tar_entries:
                         subtar_key = f"{folder_key}{tar_name}"
-                        s3.put_object(Bucket=bucket, Key=subtar_key, Body=tar_bytes)
-                        logger.info("Uploaded subtar to s3://%s/%s", bucket, subtar_key)
+                        subtar_uploads.append((subtar_key, upload_pool.submit(
+                            s3.put_object, Bucket=bucket, Key=subtar_key, Body=tar_bytes)))
+
+                # Stream the super-tarball straight into a multipart upload (stream mode "w|" never
+                # seeks), so only one part is buffered instead of the whole archive. gzip is layered
+                # explicitly because stream-mode tarfile only accepts compresslevel from Python 3.12
+                with S3MultipartWriter(s3, bucket, tar_key, content_type="application/gzip") as writer, \
+                        gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=TARBALL_GZIP_LEVEL) as gz:
+                    with tarfile.open(fileobj=gz, mode="w|") as super_tar:
+                        super_mtime = int(time.time())
+                        # level_tarballs maps level_key -> list of (tar_name, tar_bytes)
+                        for level_key, tar_entries in level_tarballs.items():
+                            for tar_name, tar_bytes in tar_entries:
+                                ti = tarfile.TarInfo(name=tar_name)
+                                ti.size = len(tar_bytes)
+                                ti.mtime = super_mtime
+                                super_tar.addfile(ti, fileobj=io.BytesIO(tar_bytes))
+                                logger.info("Added %s to super-tarball (%d bytes)", tar_name, len(tar_bytes))
+                logger.info("Uploaded supertar to s3://%s/%s", bucket, tar_key)
+
+                for subtar_key, upload in subtar_uploads:
+                    upload.result()
+                    logger.info("Uploaded subtar to s3://%s/%s", bucket, subtar_key)
 
                 # Update transfer register with newly uploaded records
                 if transfer_register is not None:
@@ -704,6 +738,8 @@ def lambda_handler(event, context):
                 result = {"status": "error", "message": f"Error uploading tarballs to S3: {e.response.get('Error', {}).get('Code')}"}
                 logger.info("Pipeline result: %s", json.dumps(result))
                 return result
+            finally:
+                upload_pool.shutdown(wait=True, cancel_futures=True)
 
 
 
@@ -1,8 +1,8 @@
 import os
 import json
-import yaml
 from pathlib import Path
-from dotenv import load_dotenv
+
+# yaml and dotenv are imported on first use; env-only callers (e.g. Lambda) never pay for them
 
 class UniversalConfig:
     def __init__(self, env_file=".env", yaml_file=None, json_file=None, base_path=None):
@@ -12,12 +12,18 @@ class UniversalConfig:
         # Resolve env_file relative to base_path
         env_path = self.base_path / env_file if not Path(env_file).is_absolute() else Path(env_file)
         if env_path.exists():
+            from dotenv import load_dotenv
             load_dotenv(env_path)
 
         self.yaml_config = self._load_yaml(yaml_file) if yaml_file else {}
         self.json_config = self._load_json(json_file) if json_file else {}
 
+        # Dotted-path lookup table so get() is a single dict lookup; YAML wins over JSON
+        self._flat = dict(self.json_config)
+        self._flat.update(_flatten(self.yaml_config))
+
     def _load_yaml(self, file):
+        import yaml
         file_path = self.base_path / file if not Path(file).is_absolute() else Path(file)
         with open(file_path) as f:
             return yaml.safe_load(f)
@@ -33,19 +39,22 @@ class UniversalConfig:
         if val:
             return val
 
-        # Check YAML nested keys
-        if "." in key_path:
-            keys = key_path.split(".")
-            value = self.yaml_config
-            for k in keys:
-                value = value.get(k, {})
-            if value != {}:
-                return value
-        elif key_path in self.yaml_config:
-            return self.yaml_config[key_path]
-
-        # Check JSON
-        if key_path in self.json_config:
-            return self.json_config[key_path]
-
-        return default
+        # Check YAML (nested keys flattened to dotted paths), then JSON
+        return self._flat.get(key_path, default)
+
+
+def _flatten(config):
+    """Flatten nested dicts into {"a.b.c": value}, keeping an entry for every level."""
+    flat = {}
+    stack = [((), config or {})]
+    while stack:
+        path, node = stack.pop()
+        for k, v in node.items():
+            key = path + (str(k),)
+            # A nested key mapping to {} counts as unset, so get() falls through to JSON
+            if path and v == {}:
+                continue
+            flat[".".join(key)] = v
+            if isinstance(v, dict):
+                stack.append((key, v))
+    return flat
@@ -2,9 +2,9 @@
 Generic transformer orchestrator.
 Routes transformation requests to appropriate transformer plugins.
 """
-import json
-from typing import Any, Dict
-from src.transformers import TRANSFORMER_REGISTRY
+import functools
+from typing import Any, Callable, Dict
+from src.transformers import TRANSFORMER_REGISTRY, BaseTransformer
 
 
 class TransformerOrchestrator:
@@ -18,6 +18,24 @@ class TransformerOrchestrator:
     def __init__(self):
         """Initialize the generic transformer with the plugin registry."""
         self.registry = TRANSFORMER_REGISTRY
+        # One plugin instance per operation is reused, across warm invocations too.
+        # Plugins may cache between calls, but must reset any per-execution state
+        # (e.g. ReplicaMetadataTransformer's body cache) in execute.
+        # Cached per orchestrator (not on the class) so the cache doesn't pin self.
+        self._get_transformer = functools.lru_cache(maxsize=None)(self._create_transformer)
+    
+    def _create_transformer(self, operation: str) -> BaseTransformer:
+        """Look up and instantiate the transformer plugin for an operation."""
+        transformer_factory = self.registry.get(operation)
+        
+        if not transformer_factory:
+            available_ops = ', '.join(self.registry.keys())
+            raise ValueError(
+                f"Unknown operation '{operation}'. "
+                f"Available operations: {available_ops}"
+            )
+        
+        return transformer_factory()
     
     def transform(self, data: Any, config: Dict[str, Any], context: Dict[str, Any]) -> Any:
         """
@@ -42,19 +60,41 @@ class TransformerOrchestrator:
         if not operation:
             raise ValueError("Configuration must specify 'operation' field")
         
-        # Get the transformer class from registry
-        transformer_class = self.registry.get(operation)
+        return self._get_transformer(operation).execute(data, config, context)
+    
+    def compile_pipeline(self, transformation_config: Dict[str, Dict[str, Any]]) -> Callable[[Any, Dict[str, Any]], Any]:
+        """
+        Build a function running every configured step in order.
         
-        if not transformer_class:
-            available_ops = ', '.join(self.registry.keys())
-            raise ValueError(
-                f"Unknown operation '{operation}'. "
-                f"Available operations: {available_ops}"
-            )
+        Each step's transformer instance and config are resolved once, up front, so
+        running the pipeline skips the per-step operation lookup. The function sets
+        ``context['step']`` before each step.
+        
+        Args:
+            transformation_config: Step number (as str) -> step config, as in the event
+            
+        Returns:
+            Callable taking (data, context) and returning the final output
+            
+        Raises:
+            ValueError: If any step has no operation or an unknown operation
+        """
+        steps = []
+        for step in sorted(transformation_config, key=int):
+            config = transformation_config[step]
+            operation = config.get('operation')
+            if not operation:
+                raise ValueError(f"Step {step} configuration must specify 'operation' field")
+            steps.append((int(step), self._get_transformer(operation), config))
+        steps = tuple(steps)
+        
+        def run(data: Any, context: Dict[str, Any]) -> Any:
+            for step, transformer, config in steps:
+                context['step'] = step
+                data = transformer.execute(data, config, context)
+            return data
         
-        # Instantiate and execute the transformer
-        transformer = transformer_class()
-        return transformer.execute(data, config, context)
+        return run
     
     def list_operations(self):
         """Return list of available operations."""
@@ -2,18 +2,88 @@
 Storage abstraction layer - works with both S3 and local filesystem.
 Allows Lambda to run locally for testing.
 """
-import json
+import io
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Union
 import logging
-import boto3
+import msgpack
+import orjson
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+try:
+    # ISA-L backed gzip is several times faster than zlib when installed
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+from src.aws_clients import get_s3
 
 logger = logging.getLogger(__name__)
 
+# Intermediate outputs are compressed for transfer size, not ratio, so use the fastest level
+STEP_OUTPUT_GZIP_LEVEL = 1
+
+# Serialization for intermediate step outputs (CTD_INTERCHANGE); JSON stays the external format
+STEP_INTERCHANGE_CONTENT_TYPES = {
+    'msgpack': 'application/x-msgpack',
+    'json': 'application/json',
+}
+STEP_INTERCHANGE = os.getenv('CTD_INTERCHANGE', 'msgpack').strip().lower()
+if STEP_INTERCHANGE not in STEP_INTERCHANGE_CONTENT_TYPES:
+    raise ValueError(
+        f"Invalid CTD_INTERCHANGE '{STEP_INTERCHANGE}'. "
+        f"Must be one of: {', '.join(STEP_INTERCHANGE_CONTENT_TYPES)}"
+    )
+
+# Object key suffixes recognised as step outputs
+STEP_OUTPUT_EXTENSIONS = ('.msgpack', '.json', '.msgpack.gz', '.json.gz')
+
+# Maximum number of step output shards fetched concurrently
+MAX_SHARD_WORKERS = 30
+
+# Part size for streamed multipart uploads (S3 minimum is 5 MiB for all but the last part)
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
+# Bodies above 8 MiB are uploaded as parallel 8 MiB parts; smaller ones stay single-part
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_CHUNK_SIZE,
+    multipart_chunksize=MULTIPART_CHUNK_SIZE,
+    max_concurrency=10,
+    use_threads=True
+)
+
+# Downloads to disk use 5 MiB ranges fetched 8 at a time
+DOWNLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+S3_DOWNLOAD_CONFIG = TransferConfig(
+    multipart_threshold=DOWNLOAD_CHUNK_SIZE,
+    multipart_chunksize=DOWNLOAD_CHUNK_SIZE,
+    max_concurrency=8,
+    use_threads=True
+)
+
 
 class StorageClient:
-    """Abstraction for S3 or local filesystem storage."""
+    """
+    Abstraction for S3 or local filesystem storage.
+    
+    The backend is chosen once in ``__init__``; each public method dispatches to its
+    ``_local`` or ``_s3`` implementation. Use ``StorageClient.get()`` to share one
+    client per process (and so per warm Lambda container).
+    """
+    
+    _instance: Optional['StorageClient'] = None
+    
+    @classmethod
+    def get(cls) -> 'StorageClient':
+        """Return the process-wide client, detecting the storage mode on first use."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
     
     def __init__(self):
         """Initialize storage client - auto-detects LocalStack, local filesystem, or AWS S3."""
@@ -24,13 +94,7 @@ class StorageClient:
         if endpoint_url:
             # LocalStack mode
             logger.info("Running in LOCALSTACK mode - endpoint: %s", endpoint_url)
-            self.s3_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
-                region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-            )
+            self.s3_client = get_s3(endpoint_url=endpoint_url)
             self.local_mode = False
             self.local_root = None
         elif os.path.exists('/tmp/local-s3-data'):
@@ -42,7 +106,7 @@ class StorageClient:
         else:
             # AWS mode
             logger.info("Running in AWS mode - using S3")
-            self.s3_client = boto3.client('s3')
+            self.s3_client = get_s3()
             self.local_mode = False
             self.local_root = None
     
@@ -58,46 +122,42 @@ class StorageClient:
             bytes: Object content
         """
         if self.local_mode:
-            file_path = self.local_root / bucket / key
-            logger.info("Reading from local: %s", file_path)
-            
-            if not file_path.exists():
-                raise FileNotFoundError(f"Local file not found: {file_path}")
-            
-            return file_path.read_bytes()
+            return self._get_object_local(bucket, key)
+        return self._get_object_s3(bucket, key)
+    
+    def download_to_file(self, bucket: str, key: str, path: Union[str, Path]):
+        """
+        Stream an object to a local file without holding it in memory.
+        
+        Large S3 objects are downloaded as parallel byte ranges.
+        
+        Args:
+            bucket: Bucket name
+            key: Object key
+            path: Local file to write
+        """
+        if self.local_mode:
+            self._download_to_file_local(bucket, key, path)
         else:
-            response = self.s3_client.get_object(Bucket=bucket, Key=key)
-            return response['Body'].read()
+            self._download_to_file_s3(bucket, key, path)
     
-    def put_object(self, bucket: str, key: str, body: str, content_type: str = 'application/json'):
+    def put_object(self, bucket: str, key: str, body: Union[str, bytes], content_type: str = 'application/json',
+                   content_encoding: Optional[str] = None, metadata: Optional[Dict[str, str]] = None):
         """
         Write object to storage.
         
         Args:
             bucket: Bucket name
             key: Object key
-            body: Content to write
+            body: Content to write (str or bytes)
             content_type: MIME type
+            content_encoding: Content-Encoding header, e.g. 'gzip' (optional)
+            metadata: S3 user metadata (optional; the local filesystem has nowhere to keep it)
         """
         if self.local_mode:
-            file_path = self.local_root / bucket / key
-            logger.info("Writing to local: %s", file_path)
-            
-            # Create parent directories
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Write content
-            if isinstance(body, str):
-                file_path.write_text(body, encoding='utf-8')
-            else:
-                file_path.write_bytes(body)
+            self._put_object_local(bucket, key, body, content_type, content_encoding, metadata)
         else:
-            self.s3_client.put_object(
-                Bucket=bucket,
-                Key=key,
-                Body=body,
-                ContentType=content_type
-            )
+            self._put_object_s3(bucket, key, body, content_type, content_encoding, metadata)
     
     def head_object(self, bucket: str, key: str) -> bool:
         """
@@ -108,67 +168,305 @@ class StorageClient:
             key: Object key
             
         Returns:
-            bool: True if exists, False otherwise
+            bool: True if exists, False if not found; other S3 errors propagate
         """
         if self.local_mode:
-            file_path = self.local_root / bucket / key
-            return file_path.exists()
-        else:
-            try:
-                self.s3_client.head_object(Bucket=bucket, Key=key)
-                return True
-            except:
-                return False
+            return self._head_object_local(bucket, key)
+        return self._head_object_s3(bucket, key)
     
-    def list_objects(self, bucket: str, prefix: str) -> list:
+    def list_objects(self, bucket: str, prefix: str,
+                     suffix: Optional[Union[str, Tuple[str, ...]]] = None) -> list:
         """
         List objects with prefix.
         
         Args:
             bucket: Bucket name
             prefix: Key prefix
+            suffix: Only keys ending with this string (or one of these strings) (optional)
             
         Returns:
-            list: List of object keys
+            list: List of object keys, relative to the bucket root
         """
         if self.local_mode:
-            dir_path = self.local_root / bucket / prefix
-            if not dir_path.exists():
-                return []
-            
-            # Return relative paths from bucket root
-            bucket_root = self.local_root / bucket
-            return [
-                str(p.relative_to(bucket_root))
-                for p in dir_path.rglob('*')
-                if p.is_file()
-            ]
+            return self._list_objects_local(bucket, prefix, suffix)
+        return self._list_objects_s3(bucket, prefix, suffix)
+    
+    def _get_object_local(self, bucket: str, key: str) -> bytes:
+        file_path = self.local_root / bucket / key
+        logger.info("Reading from local: %s", file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"Local file not found: {file_path}")
+        
+        return file_path.read_bytes()
+    
+    def _get_object_s3(self, bucket: str, key: str) -> bytes:
+        response = self.s3_client.get_object(Bucket=bucket, Key=key)
+        return response['Body'].read()
+    
+    def _download_to_file_local(self, bucket: str, key: str, path: Union[str, Path]):
+        file_path = self.local_root / bucket / key
+        logger.info("Copying from local: %s -> %s", file_path, path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"Local file not found: {file_path}")
+        
+        shutil.copyfile(file_path, path)
+    
+    def _download_to_file_s3(self, bucket: str, key: str, path: Union[str, Path]):
+        logger.info("Downloading s3://%s/%s -> %s", bucket, key, path)
+        with open(path, 'wb') as f:
+            self.s3_client.download_fileobj(bucket, key, f, Config=S3_DOWNLOAD_CONFIG)
+    
+    def _put_object_local(self, bucket: str, key: str, body: Union[str, bytes], content_type: str = 'application/json',
+                          content_encoding: Optional[str] = None, metadata: Optional[Dict[str, str]] = None):
+        file_path = self.local_root / bucket / key
+        logger.info("Writing to local: %s", file_path)
+        
+        # Create parent directories
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Write content
+        if isinstance(body, str):
+            file_path.write_text(body, encoding='utf-8')
         else:
-            response = self.s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-            if 'Contents' not in response:
-                return []
-            return [obj['Key'] for obj in response['Contents']]
+            file_path.write_bytes(body)
+    
+    def _put_object_s3(self, bucket: str, key: str, body: Union[str, bytes], content_type: str = 'application/json',
+                       content_encoding: Optional[str] = None, metadata: Optional[Dict[str, str]] = None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        extra_args = {'ContentType': content_type}
+        if content_encoding:
+            extra_args['ContentEncoding'] = content_encoding
+        if metadata:
+            extra_args['Metadata'] = metadata
+        # upload_fileobj goes multipart above the threshold, using several connections
+        self.s3_client.upload_fileobj(
+            io.BytesIO(body),
+            bucket,
+            key,
+            ExtraArgs=extra_args,
+            Config=S3_TRANSFER_CONFIG
+        )
+    
+    def _head_object_local(self, bucket: str, key: str) -> bool:
+        file_path = self.local_root / bucket / key
+        return file_path.exists()
+    
+    def _head_object_s3(self, bucket: str, key: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            # Only a missing object means False; permission and throttling errors propagate
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+    
+    def _list_objects_local(self, bucket: str, prefix: str,
+                            suffix: Optional[Union[str, Tuple[str, ...]]] = None) -> list:
+        dir_path = self.local_root / bucket / prefix
+        if not dir_path.is_dir():
+            return []
+        
+        # Walk with os.scandir (DirEntry caches its file type) and return paths relative
+        # to the bucket root by slicing strings rather than building Path objects
+        bucket_root_len = len(str(self.local_root / bucket)) + 1
+        keys = []
+        stack = [str(dir_path)]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        if suffix is None or entry.name.endswith(suffix):
+                            keys.append(entry.path[bucket_root_len:])
+                    elif entry.is_dir():
+                        stack.append(entry.path)
+        return keys
+    
+    def _list_objects_s3(self, bucket: str, prefix: str,
+                         suffix: Optional[Union[str, Tuple[str, ...]]] = None) -> list:
+        # A single list_objects_v2 call stops at 1,000 keys, so follow the continuation pages
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        return [
+            obj['Key']
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix, PaginationConfig={'PageSize': 1000})
+            for obj in page.get('Contents', [])
+            if suffix is None or obj['Key'].endswith(suffix)
+        ]
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only stream that uploads to S3 as a multipart upload.
+    
+    Written bytes are buffered until a full part is available, which is then sent with
+    ``upload_part``; ``close()`` uploads the tail and completes the upload. Suitable as
+    the ``fileobj`` for non-seeking writers such as ``tarfile.open(mode="w|gz")``.
+    """
+    
+    def __init__(self, s3_client: Any, bucket: str, key: str, part_size: int = MULTIPART_PART_SIZE,
+                 content_type: str = 'application/octet-stream'):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._parts: List[Dict[str, Any]] = []
+        self._upload_id = s3_client.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type
+        )['UploadId']
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+    
+    def _upload_part(self, body: bytes):
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body
+        )
+        self._parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+    
+    def close(self):
+        """Upload any buffered tail and complete the multipart upload."""
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._parts:
+                self._upload_part(bytes(self._buffer))
+                self._buffer.clear()
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={'Parts': self._parts}
+            )
+            logger.info("Completed multipart upload s3://%s/%s (%d parts)", self.bucket, self.key, len(self._parts))
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            super().close()
+    
+    def abort(self):
+        """Abort the multipart upload, discarding any uploaded parts."""
+        if self.closed:
+            return
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            logger.warning("Aborted multipart upload s3://%s/%s", self.bucket, self.key)
+        finally:
+            super().close()
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def key_stem(key: str) -> str:
+    """
+    Final path component of an object key without its last extension.
+    
+    Equivalent to ``Path(key).stem`` (``"xml_input/file.xml"`` -> ``"file"``) using plain
+    string partitioning, which is several times cheaper inside per-object loops.
+    """
+    name = key.rstrip('/').rpartition('/')[2]
+    stem, _, extension = name.rpartition('.')
+    return stem if stem and extension else name
+
 
+def step_output_key(key_base: str) -> str:
+    """Full key of an intermediate step output: ``key_base`` + format extension + ``.gz``."""
+    return f"{key_base}.{STEP_INTERCHANGE}.gz"
 
-def check_step_completed(storage: StorageClient, bucket: str, prefix: str) -> bool:
+
+def put_step_output(storage: StorageClient, bucket: str, key_base: str, obj: Any,
+                    metadata: Optional[Dict[str, str]] = None) -> str:
     """
-    Check if a transformation step has completed by looking for _SUCCESS marker.
+    Serialize an intermediate step output in the CTD_INTERCHANGE format and write it
+    gzip-compressed.
     
     Args:
         storage: Storage client
         bucket: S3 bucket name
-        prefix: Step prefix (e.g., "processed/exec-123/step_1/")
+        key_base: Output key without extension
+        obj: Step output to serialize
+        metadata: Optional S3 user metadata for the object
+        
+    Returns:
+        The key written (see ``step_output_key``)
+    """
+    if STEP_INTERCHANGE == 'msgpack':
+        body = msgpack.packb(obj, use_bin_type=True)
+    else:
+        body = orjson.dumps(obj)
+    
+    key = step_output_key(key_base)
+    storage.put_object(
+        bucket,
+        key,
+        gzip.compress(body, compresslevel=STEP_OUTPUT_GZIP_LEVEL),
+        STEP_INTERCHANGE_CONTENT_TYPES[STEP_INTERCHANGE],
+        content_encoding='gzip',
+        metadata=metadata
+    )
+    return key
+
+
+def get_step_output(storage: StorageClient, bucket: str, key: str) -> Any:
+    """
+    Load a single step output object, decoding it based on the key extension.
+    
+    Either interchange format is readable regardless of CTD_INTERCHANGE, so a
+    change of setting mid-execution does not strand earlier outputs.
+    
+    Args:
+        storage: Storage client
+        bucket: S3 bucket name
+        key: Output key (``.msgpack`` or ``.json``, optionally with ``.gz``)
         
     Returns:
-        True if _SUCCESS marker exists, False otherwise
+        Parsed data
     """
-    success_marker = f"{prefix}_SUCCESS"
-    return storage.head_object(bucket, success_marker)
+    content = storage.get_object(bucket, key)
+    if key.endswith('.gz'):
+        content = gzip.decompress(content)
+        key = key[:-3]
+    if key.endswith('.msgpack'):
+        return msgpack.unpackb(content, raw=False)
+    return orjson.loads(content)
+
+
+def _merge_shards(shards: List[Any]) -> Any:
+    """Combine step output shards: dicts are merged, lists are concatenated."""
+    if all(isinstance(shard, dict) for shard in shards):
+        merged = {}
+        for shard in shards:
+            merged.update(shard)
+        return merged
+    if all(isinstance(shard, list) for shard in shards):
+        return [item for shard in shards for item in shard]
+    raise ValueError("Cannot merge step output shards of mixed types")
 
 
 def load_json_from_prefix(storage: StorageClient, bucket: str, prefix: str) -> Optional[Dict[str, Any]]:
     """
-    Load JSON output from a step's output folder.
+    Load the output of a step from its output folder.
+    
+    Intermediate steps write gzipped MessagePack or JSON (``.msgpack.gz``/``.json.gz``,
+    per CTD_INTERCHANGE) and the final step writes JSON (``.json``); the decoder is
+    chosen from the key extension. When the step
+    produced several shards they are fetched concurrently and merged.
     
     Args:
         storage: Storage client
@@ -176,23 +474,23 @@ def load_json_from_prefix(storage: StorageClient, bucket: str, prefix: str) -> O
         prefix: Step prefix (e.g., "processed/exec-123/step_1/")
         
     Returns:
-        Parsed JSON data or None if not found
+        Parsed data or None if not found
     """
     try:
-        # List objects in the prefix
-        keys = storage.list_objects(bucket, prefix)
+        # List output files in the prefix
+        keys = sorted(storage.list_objects(bucket, prefix, suffix=STEP_OUTPUT_EXTENSIONS))
         
         if not keys:
             return None
         
-        # Find the JSON file (not _SUCCESS marker)
-        for key in keys:
-            if key.endswith('.json') and not key.endswith('_SUCCESS'):
-                # Read and parse the JSON file
-                content = storage.get_object(bucket, key)
-                return json.loads(content.decode('utf-8'))
+        if len(keys) == 1:
+            return get_step_output(storage, bucket, keys[0])
         
-        return None
+        logger.info("Loading %d output shards from %s", len(keys), prefix)
+        with ThreadPoolExecutor(max_workers=min(MAX_SHARD_WORKERS, len(keys))) as pool:
+            shards = list(pool.map(lambda key: get_step_output(storage, bucket, key), keys))
+        
+        return _merge_shards(shards)
         
     except Exception as e:
         logger.exception("Error loading JSON from %s", prefix)
@@ -1,23 +1,52 @@
 """
 Transformer plugin registry.
-Maps operation names to transformer classes.
+Maps operation names to transformer factories.
+
+Transformer classes are imported on first use (PEP 562 module ``__getattr__``), so a
+cold start only loads the modules for the operations it actually runs.
 """
+import importlib
+from types import MappingProxyType
+
 from .base import BaseTransformer
-from .xml_converter import XMLConverterTransformer
-from .newline_to_p import NewlineToPTransformer
-from .y_naming import YNamingTransformer
-from .replica_metadata import ReplicaMetadataTransformer
-
-
-# Plugin registry mapping operation names to transformer classes
-TRANSFORMER_REGISTRY = {
-    'convert': XMLConverterTransformer,
-    'newline_to_p': NewlineToPTransformer,
-    'y_naming': YNamingTransformer,
-    'replica_metadata': ReplicaMetadataTransformer,
+
+
+# Transformer class name -> submodule defining it
+_LAZY_CLASSES = {
+    'XMLConverterTransformer': '.xml_converter',
+    'NewlineToPTransformer': '.newline_to_p',
+    'YNamingTransformer': '.y_naming',
+    'ReplicaMetadataTransformer': '.replica_metadata',
 }
 
 
+def __getattr__(name):
+    module = _LAZY_CLASSES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    cls = getattr(importlib.import_module(module, __name__), name)
+    # Cache on the module so later lookups bypass __getattr__
+    globals()[name] = cls
+    return cls
+
+
+def _factory(class_name):
+    """Zero-argument callable creating an instance of a lazily imported transformer."""
+    def create() -> BaseTransformer:
+        return __getattr__(class_name)()
+    create.__qualname__ = create.__name__ = class_name
+    return create
+
+
+# Plugin registry mapping operation names to transformer factories (read-only)
+TRANSFORMER_REGISTRY = MappingProxyType({
+    'convert': _factory('XMLConverterTransformer'),
+    'newline_to_p': _factory('NewlineToPTransformer'),
+    'y_naming': _factory('YNamingTransformer'),
+    'replica_metadata': _factory('ReplicaMetadataTransformer'),
+})
+
+
 __all__ = [
     'BaseTransformer',
     'TRANSFORMER_REGISTRY',
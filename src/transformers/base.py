@@ -3,7 +3,29 @@ Base transformer interface for plugin registry pattern.
 All transformer wrappers must inherit from this base class.
 """
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Callable, Dict
+
+
+def walk_strings(obj: Any, fn: Callable[[str], str]) -> Any:
+    """Replace every string value in a JSON-like object with fn(value), in place."""
+    if isinstance(obj, str):
+        return fn(obj)
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            continue
+        # Only string leaves are written back; containers are pushed, other values left alone
+        for k, v in items:
+            if isinstance(v, str):
+                node[k] = fn(v)
+            elif isinstance(v, (dict, list)):
+                stack.append(v)
+    return obj
 
 
 class BaseTransformer(ABC):
@@ -15,6 +37,9 @@ class BaseTransformer(ABC):
     - config: Configuration parameters specific to this transformation
     - context: Additional context (S3 client, execution_id, etc.)
     
+    The pipeline owns each step's input (freshly loaded or the previous step's
+    output), so execute may modify data in place rather than copying it.
+    
     Returns:
         The transformed data in the same or compatible format
     """
@@ -1,11 +1,28 @@
 """
 Newline to paragraph transformer.
 """
+import functools
 import re
-import copy
-from typing import Any, Dict, Optional, Iterable
+from copy import deepcopy
+from typing import Any, Dict, Optional, Iterable, Tuple
 
-from .base import BaseTransformer
+import orjson
+
+from .base import BaseTransformer, walk_strings
+
+
+# Lone carriage returns are normalised to line feeds
+_CR_TO_LF = str.maketrans({'\r': '\n'})
+
+# Characters that give a pattern regex meaning
+_REGEX_METACHARS = re.compile(r'[\\\[\](){}.^$|*+?]')
+
+
+@functools.lru_cache(maxsize=128)
+def _get_logic(target_fields: Optional[Tuple[str, ...]], match: str, replace: str,
+               bulk_mode: bool = False) -> 'NewlineToPLogic':
+    """Shared NewlineToPLogic per distinct config; it holds no per-record state."""
+    return NewlineToPLogic(target_columns=target_fields, match=match, replace=replace, bulk_mode=bulk_mode)
 
 
 class NewlineToPTransformer(BaseTransformer):
@@ -15,8 +32,10 @@ class NewlineToPTransformer(BaseTransformer):
     
     Config parameters:
         target_fields: List of field paths to transform (e.g., ["scopecontent.p"]) (optional)
-        match: Regex pattern to replace (default: "\\n")
+        match: Regex pattern to replace (default: a newline)
         replace: String to replace with (default: "<p>")
+        bulk_mode: Without target_fields, substitute over the serialized record in one
+            pass where the pattern allows it; output is the same as without it (default: False)
     """
 
     def execute(self, data: Any, config: Dict[str, Any], context: Dict[str, Any]) -> Any:
@@ -25,75 +44,103 @@ class NewlineToPTransformer(BaseTransformer):
         
         Args:
             data: JSON dict to transform
-            config: May contain 'target_fields', 'match', 'replace'
+            config: May contain 'target_fields', 'match', 'replace', 'bulk_mode'
             context: Runtime context (not used)
             
         Returns:
             Transformed JSON dict
         """
         target_fields = config.get('target_fields')
-        match = config.get('match', r'\\n')
+        match = config.get('match', '\n')
         replace = config.get('replace', '<p>')
         
-        logic = NewlineToPLogic(
-            target_columns=target_fields,
-            match=match,
-            replace=replace
+        logic = _get_logic(
+            tuple(target_fields) if target_fields is not None else None,
+            match,
+            replace,
+            bool(config.get('bulk_mode', False))
         )
         
-        return logic.transform(data)
+        return logic.transform(data, copy=False)
 
 
 class NewlineToPLogic:
-    def __init__(self, target_columns: Optional[Iterable[str]] = None, match="\\n", replace="<p>"):
+    def __init__(self, target_columns: Optional[Iterable[str]] = None, match="\n", replace="<p>",
+                 bulk_mode: bool = False):
         self.target_columns = target_columns
         self.match = match
         self.replace = replace
-        self.regex = re.compile(self.match)
+        # Target paths are fixed, so split and parse them once rather than per record
+        self._parsed_columns = [
+            [self._parse_part(part) for part in field_path.split('.')]
+            for field_path in (target_columns or ())
+        ]
+        # A pattern without metacharacters (and a replacement without group references)
+        # is a plain substring swap, which str.replace does far faster than re.sub
+        self._is_literal = not _REGEX_METACHARS.search(self.match) and '\\' not in self.replace
+        # Literal patterns (including the default newline) never touch the regex engine
+        self.regex = None if self._is_literal else re.compile(self.match)
+        # Substitution bound once, so the per-string path has no branch or attribute lookups
+        match, replace = self.match, self.replace
+        if self._is_literal:
+            self._substitute = lambda text: text.replace(match, replace)
+        else:
+            self._substitute = functools.partial(self.regex.sub, replace)
+        # Bulk mode replaces the JSON-escaped pattern in the serialized payload instead of
+        # walking it. Only literal patterns whose escaped form starts with a backslash (e.g.
+        # "\n") qualify: outside strings JSON has no backslashes, so such a match can never
+        # touch numbers, true/false/null or structure
+        self._bulk = None
+        if bulk_mode and self._is_literal and self.match:
+            escaped_match = orjson.dumps(self.match)[1:-1]
+            if escaped_match.startswith(b'\\'):
+                self._bulk = (escaped_match, orjson.dumps(self.replace)[1:-1])
 
     def _transform_string(self, s: str) -> str:
         """Apply the newline -> <p> policy to a single string."""
         if not isinstance(s, str):
             return s
-        text = s.replace('\r\n', '\n').replace('\r', '\n')
+        text = s
+        if '\r' in text:
+            # CRLF -> LF, then any lone CR -> LF in a single translate pass
+            if '\r\n' in text:
+                text = text.replace('\r\n', '\n')
+            text = text.translate(_CR_TO_LF)
         try:
-            return self.regex.sub(self.replace, text)
+            return self._substitute(text)
         except Exception:
             return re.sub(r'\n+', self.replace, text)
 
-    def _walk_and_transform(self, obj):
-        """Recursively walk dict/list and transform all string values in-place."""
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                obj[k] = self._walk_and_transform(v)
-            return obj
-        if isinstance(obj, list):
-            for i, v in enumerate(obj):
-                obj[i] = self._walk_and_transform(v)
-            return obj
-        if isinstance(obj, str):
-            return self._transform_string(obj)
-        return obj
-
     @staticmethod
     def _parse_part(part: str):
-        m = re.match(r'^([^\[]+)(?:\[(\d+)\])?$', part)
-        if not m:
+        """Split 'key' or 'key[N]' into (key, N); anything else is returned whole as the key."""
+        i = part.find('[')
+        if i == -1:
             return part, None
-        key = m.group(1)
-        idx = int(m.group(2)) if m.group(2) is not None else None
-        return key, idx
+        digits = part[i + 1:-1]
+        if i == 0 or not part.endswith(']') or not digits.isdecimal():
+            return part, None
+        return part[:i], int(digits)
 
     def set_by_path(self, obj: Any, path: str, value: Any) -> bool:
         """Set value at dotted/bracket path."""
+        if '.' not in path and '[' not in path:
+            # Plain top-level key: no split or parse needed
+            if isinstance(obj, dict) and path in obj:
+                obj[path] = value
+                return True
+            return False
+        return self._set_parsed(obj, [self._parse_part(part) for part in path.split('.')], value)
+
+    @staticmethod
+    def _set_parsed(obj: Any, parts, value: Any) -> bool:
+        """Set value at a path already split into (key, index) parts."""
         cur = obj
-        parts = path.split('.')
-        for i, part in enumerate(parts):
-            key, idx = self._parse_part(part)
-            last = (i == len(parts) - 1)
+        last_i = len(parts) - 1
+        for i, (key, idx) in enumerate(parts):
             if not isinstance(cur, dict):
                 return False
-            if last:
+            if i == last_i:
                 if idx is None:
                     if key in cur:
                         cur[key] = value
@@ -116,9 +163,16 @@ class NewlineToPLogic:
 
     def get_by_path(self, obj: Any, path: str, default: Any = None) -> Any:
         """Return value at dotted/bracket path or default if not found."""
+        if '.' not in path and '[' not in path:
+            # Plain top-level key: no split or parse needed
+            return obj.get(path, default) if isinstance(obj, dict) else default
+        return self._get_parsed(obj, [self._parse_part(part) for part in path.split('.')], default)
+
+    @staticmethod
+    def _get_parsed(obj: Any, parts, default: Any = None) -> Any:
+        """Return value at a path already split into (key, index) parts, or default."""
         cur = obj
-        for part in path.split('.'):
-            key, idx = self._parse_part(part)
+        for key, idx in parts:
             if not isinstance(cur, dict):
                 return default
             cur = cur.get(key, default)
@@ -130,20 +184,61 @@ class NewlineToPLogic:
                 cur = cur[idx]
         return cur
 
-    def transform(self, data: dict, **kwargs) -> dict:
+    def _keys_affected(self, data: Any) -> bool:
+        """Whether any dict key contains the pattern or a CR, which the walker leaves alone."""
+        match = self.match
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                for k, v in node.items():
+                    if isinstance(k, str) and (match in k or '\r' in k):
+                        return True
+                    if isinstance(v, (dict, list)):
+                        stack.append(v)
+            elif isinstance(node, list):
+                stack.extend(v for v in node if isinstance(v, (dict, list)))
+        return False
+
+    def _bulk_transform(self, data: Any) -> Any:
+        """Substitute over the serialized payload in one pass; None if that isn't safe."""
+        # The serialized buffer includes keys, so a key holding the pattern would be renamed
+        # (and could collide with another key); leave those payloads to the walker
+        if self._keys_affected(data):
+            return None
+        try:
+            buf = orjson.dumps(data)
+        except TypeError:
+            return None
+        if b'\\\\' in buf:
+            # An escaped backslash followed by e.g. "n" would read as a false "\n" match
+            return None
+        if b'\\r' in buf:
+            buf = buf.replace(b'\\r\\n', b'\\n').replace(b'\\r', b'\\n')
+        escaped_match, escaped_replace = self._bulk
+        return orjson.loads(buf.replace(escaped_match, escaped_replace))
+
+    def transform(self, data: dict, copy: bool = True, **kwargs) -> dict:
         """
         If target_columns is None, apply transformation to every string value.
         If target_columns is provided, apply only to those fields.
+        With copy=False, data is modified in place instead of a copy (bulk mode
+        always returns a new object).
         """
-        payload = copy.deepcopy(data)
+        if self.target_columns is None and self._bulk is not None:
+            result = self._bulk_transform(data)
+            if result is not None:
+                return result
+
+        payload = deepcopy(data) if copy else data
 
         if self.target_columns is None:
-            return self._walk_and_transform(payload)
+            return walk_strings(payload, self._transform_string)
 
-        for field_path in self.target_columns:
-            current_value = self.get_by_path(payload, field_path)
+        for parts in self._parsed_columns:
+            current_value = self._get_parsed(payload, parts)
             if isinstance(current_value, str):
                 new_value = self._transform_string(current_value)
                 if new_value != current_value:
-                    self.set_by_path(payload, field_path, new_value)
+                    self._set_parsed(payload, parts, new_value)
         return payload
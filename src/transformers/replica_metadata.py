@@ -1,13 +1,36 @@
 """
 Replica metadata transformer.
 """
-import json
+import copy
+import functools
 import logging
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
 
+import orjson
 from botocore.exceptions import ClientError
 from .base import BaseTransformer
 
+# Concurrent GETs when fetching metadata for a batch of records. The client is the shared
+# one from src.aws_clients (thread-safe, 50-connection pool with keepalive), reused for
+# every call in an invocation, so this stays below the pool size to avoid waiting on it
+MAX_FETCH_WORKERS = 32
+
+# Metadata object bodies kept per execution, so records sharing an IAID download once
+BODY_CACHE_SIZE = 4096
+
+
+def _get_object_body(s3_client: Any, bucket: str, key: str) -> Optional[bytes]:
+    """Body of an S3 object, or None if it does not exist; other errors propagate."""
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ("NoSuchKey", "404"):
+            return None
+        raise
+    body = response.get('Body')
+    return body.read() if body else None
+
 
 class ReplicaMetadataTransformer(BaseTransformer):
     """
@@ -20,24 +43,49 @@ class ReplicaMetadataTransformer(BaseTransformer):
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        # Transformer instances outlive an invocation, so the body cache is replaced
+        # whenever the execution changes rather than serving stale metadata
+        self._cache_execution_id = None
+        self._fetch_body = None
+        # Logic built on first use and reused until the client, bucket, prefix or body
+        # cache it was built with changes
+        self._logic = None
+        self._logic_key = None
 
     def execute(self, data: Any, config: Dict[str, Any], context: Dict[str, Any]) -> Any:
         """
-        Fetches replica metadata and attaches it to the record.
+        Fetches replica metadata and attaches it to the record(s).
 
         Args:
-            data: The JSON record to transform (expects {"record": {"iaid": ...}}).
+            data: The JSON record to transform (expects {"record": {"iaid": ...}}), or a
+                batch of such records as a list or a dict keyed by IAID. For a batch, the
+                metadata for every distinct IAID is fetched concurrently and attached
+                to its records as each fetch completes.
             config: Must contain 'bucket'. Can contain 'prefix'.
             context: Must contain 'storage' client with an 's3_client' attribute.
 
         Returns:
-            The transformed JSON record, or the original if metadata is not found.
+            The transformed JSON record(s); records without metadata are left unchanged.
         """
-        if 'record' not in data or 'iaid' not in data.get('record', {}):
-            self.logger.warning("Input data does not have the expected structure with 'record' and 'iaid'.")
+        if isinstance(data, dict) and 'record' in data:
+            records = [data]
+        elif isinstance(data, dict):
+            records = list(data.values())
+        elif isinstance(data, list):
+            records = data
+        else:
+            records = [data]
+
+        records_by_iaid: Dict[str, list] = {}
+        for record in records:
+            if not isinstance(record, dict) or 'iaid' not in record.get('record', {}):
+                self.logger.warning("Input data does not have the expected structure with 'record' and 'iaid'.")
+                continue
+            records_by_iaid.setdefault(record['record']['iaid'], []).append(record)
+        iaids = list(records_by_iaid)
+        if not iaids:
             return data
 
-        iaid = data['record']['iaid']
         bucket = config.get('bucket')
         prefix = config.get('prefix', 'replica')
         storage_client = context.get('storage')
@@ -48,31 +96,50 @@ class ReplicaMetadataTransformer(BaseTransformer):
             raise ValueError("ReplicaMetadataTransformer requires a 'storage' client in context")
 
         s3_client = storage_client.s3_client
-        
-        logic = ReplicaMetadataLogic(s3_client, bucket, prefix)
-        metadata = logic.fetch_metadata(iaid)
 
-        if metadata:
-            data['replica'] = metadata
-            if 'replicaId' in metadata:
-                data['record']['replicaId'] = metadata['replicaId']
+        execution_id = context.get('execution_id')
+        if self._fetch_body is None or execution_id != self._cache_execution_id:
+            self._fetch_body = functools.lru_cache(maxsize=BODY_CACHE_SIZE)(_get_object_body)
+            self._cache_execution_id = execution_id
+        
+        logic_key = (id(s3_client), bucket, prefix, id(self._fetch_body))
+        if self._logic is None or logic_key != self._logic_key:
+            self._logic = ReplicaMetadataLogic(s3_client, bucket, prefix, fetch_body=self._fetch_body)
+            self._logic_key = logic_key
+
+        # Attach each record's metadata as its GET completes, overlapping the
+        # attachment with the fetches still in flight
+        for iaid, metadata in self._logic.iter_metadata(iaids):
+            if not metadata:
+                continue
+            for i, record in enumerate(records_by_iaid[iaid]):
+                # Records sharing an IAID each get their own copy, as later steps edit in place
+                replica = copy.deepcopy(metadata) if i else metadata
+                record['replica'] = replica
+                if 'replicaId' in replica:
+                    record['record']['replicaId'] = replica['replicaId']
         
         return data
 
 
 class ReplicaMetadataLogic:
-    def __init__(self, s3_client: Any, bucket_name: str, prefix: str = "replica"):
+    def __init__(self, s3_client: Any, bucket_name: str, prefix: str = "replica",
+                 fetch_body: Optional[Callable[[Any, str, str], Optional[bytes]]] = None):
         self.logger = logging.getLogger(__name__)
         self.s3 = s3_client
+        # (s3_client, bucket, key) -> body or None; pass a cached wrapper to share downloads
+        self.fetch_body = fetch_body or _get_object_body
         self.bucket = bucket_name
         self.prefix = prefix.strip().strip('/') if prefix else ''
+        # Key template resolved once, so building a key is a single bound format call
+        if self.prefix:
+            escaped = self.prefix.replace('{', '{{').replace('}', '}}')
+            self._key_fmt = (escaped + '/{}.json').format
+        else:
+            self._key_fmt = '{}.json'.format
 
     def _get_object_key(self, iaid: str) -> str:
-        if not iaid:
-            return ''
-        if self.prefix:
-            return f"{self.prefix}/{iaid}.json"
-        return f"{iaid}.json"
+        return self._key_fmt(iaid) if iaid else ''
 
     def fetch_metadata(self, iaid: str) -> Optional[Dict[str, Any]]:
         if not self.s3 or not iaid:
@@ -82,26 +149,42 @@ class ReplicaMetadataLogic:
         self.logger.debug(f"Fetching replica metadata from s3://{self.bucket}/{key}")
 
         try:
-            response = self.s3.get_object(Bucket=self.bucket, Key=key)
-            body = response.get('Body')
-            if not body:
+            raw_content = self.fetch_body(self.s3, self.bucket, key)
+            if raw_content is None:
+                self.logger.debug(f"Replica metadata not found for iaid '{iaid}' at key '{key}'")
                 return None
-            
-            raw_content = body.read()
             if not raw_content:
                 return None
-                
-            return json.loads(raw_content.decode('utf-8'))
+            
+            # Parsed per call so each caller gets its own dict to modify; orjson reads
+            # the UTF-8 bytes directly, with no intermediate str
+            return orjson.loads(raw_content)
 
         except ClientError as e:
-            if e.response['Error']['Code'] in ("NoSuchKey", "404"):
-                self.logger.debug(f"Replica metadata not found for iaid '{iaid}' at key '{key}'")
-            else:
-                self.logger.error(f"S3 ClientError fetching replica metadata for '{iaid}': {e}")
+            self.logger.error(f"S3 ClientError fetching replica metadata for '{iaid}': {e}")
             return None
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             self.logger.error(f"Failed to decode JSON for replica metadata '{iaid}': {e}")
             return None
         except Exception as e:
             self.logger.error(f"An unexpected error occurred fetching replica metadata for '{iaid}': {e}")
             return None
+
+    def iter_metadata(self, iaids: Iterable[str]) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Yields (IAID, metadata) pairs as each S3 GET completes.
+
+        Duplicate IAIDs are fetched once. Results arrive in completion order, not
+        input order, so callers can work on one record while others are in flight.
+        Metadata is None where not found or unreadable, as with fetch_metadata.
+        """
+        unique_iaids = list(dict.fromkeys(iaid for iaid in iaids if iaid))
+        if len(unique_iaids) <= 1:
+            for iaid in unique_iaids:
+                yield iaid, self.fetch_metadata(iaid)
+            return
+
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(unique_iaids))) as pool:
+            futures = {pool.submit(self.fetch_metadata, iaid): iaid for iaid in unique_iaids}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
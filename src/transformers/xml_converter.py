@@ -1,12 +1,28 @@
 """
 XML to JSON converter transformer.
 """
+import io
+import os
 import re
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, Optional
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
 
 from .base import BaseTransformer
 
+# ElementPath to a record's IAID; also used to key the parentId lookup
+_IAID_PATH = "Alternative_number/[alternative_number.type='CALM RecordID']/alternative_number"
+
+# heldBy reference for each holding institution.name
+_HELD_BY = {
+    "The National Archives, Kew": {"xReferenceId": "A13530124", "xReferenceCode": "66", "xReferenceName": "The National Archives, Kew"},
+    "UK Parliament": {"xReferenceId": "A13531051", "xReferenceCode": "61", "xReferenceName": "UK Parliament"},
+    "British Film Institute (BFI) National Archive": {"xReferenceId": "A13532152", "xReferenceCode": "2870", "xReferenceName": "British Film Institute (BFI) National Archive"},
+}
+
+# YYYY-MM-DD dates anywhere in a date element's text, rewritten as YYYYMMDD
+_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
 
 class XMLConverterTransformer(BaseTransformer):
     """
@@ -18,18 +34,20 @@ class XMLConverterTransformer(BaseTransformer):
 
     def execute(self, data: Any, config: Dict[str, Any], context: Dict[str, Any]) -> Any:
         """
-        Convert XML string to a dictionary of JSON records.
+        Convert an XML document to a dictionary of JSON records.
         
         Args:
-            data: XML string to convert.
+            data: XML document to convert, as str or raw bytes (bytes are parsed
+                without decoding first, honouring the XML encoding declaration),
+                or the path of a local XML file given as an os.PathLike.
             config: May contain 'remove_empty_fields'.
             context: Runtime context (not used).
             
         Returns:
             A dictionary where keys are IAIDs and values are the converted JSON records.
         """
-        if not isinstance(data, str):
-            raise ValueError(f"XMLConverterTransformer expects string input, got {type(data)}")
+        if not isinstance(data, (str, bytes, os.PathLike)):
+            raise ValueError(f"XMLConverterTransformer expects str, bytes or path input, got {type(data)}")
 
         remove_empty_fields = config.get('remove_empty_fields', True)
         
@@ -46,100 +64,179 @@ class XMLConverterLogic:
             'SERIES': 6, 'SUB-SERIES': 7, 'SUB-SUB-SERIES': 8,
             'FILE': 9, 'ITEM': 10
         }
+        # Text transforms by element tag, applied in one walk over each record
+        self._element_handlers = {
+            'record_type': self._transform_record_type,
+            'client_filepath': self._transform_client_filepath,
+            'dating.date.start': self._transform_date,
+            'dating.date.end': self._transform_date,
+            'inscription.language': self._transform_language,
+        }
 
     def _clean_none(self, obj: Any) -> Optional[Any]:
-        """Recursively remove None values and empty containers from an object."""
-        if obj is None:
-            return None
+        """
+        Recursively remove None values and empty containers from an object.
+
+        Containers are cleaned in place (records are freshly built, so nothing else holds
+        them); returns the object, or None if it ended up empty.
+        """
         if isinstance(obj, dict):
-            new_dict = {k: self._clean_none(v) for k, v in obj.items() if v is not None}
-            return {k: v for k, v in new_dict.items() if v is not None and (isinstance(v, (dict, list)) and len(v) > 0 or not isinstance(v, (dict, list)))} or None
+            # A cleaned child is None exactly when it was None or emptied out
+            for key in [k for k, v in obj.items() if self._clean_none(v) is None]:
+                del obj[key]
+            return obj or None
         if isinstance(obj, list):
-            new_list = [self._clean_none(item) for item in obj]
-            return [item for item in new_list if item is not None and (isinstance(item, (dict, list)) and len(item) > 0 or not isinstance(item, (dict, list)))] or None
+            obj[:] = [item for item in obj if self._clean_none(item) is not None]
+            return obj or None
         return obj
 
-    def convert(self, xml_string: str) -> Dict[str, Any]:
-        """Parses an XML string and converts it to a dictionary of records."""
-        root = ET.fromstring(xml_string)
+    def convert(self, xml_string: Union[str, bytes, os.PathLike]) -> Dict[str, Any]:
+        """Parses an XML string, bytes or file path and converts it to a dictionary of records."""
+        return dict(self.iter_convert(xml_string))
 
-        # Perform transformations directly on the XML tree
-        self._transform_record_types(root)
-        self._transform_client_filepaths(root)
-        self._transform_dates(root)
-        self._transform_languages(root)
+    def iter_convert(self, xml_source: Union[str, bytes, os.PathLike]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields (iaid, record) pairs, streaming the XML rather than building the whole tree.
 
+        The document is read twice with iterparse: first to build the object_number lookup
+        used for parentId resolution (a parent may appear after its children), then to
+        convert each <record>. Records are cleared once processed, so memory is bounded by
+        the lookup and the current record rather than the full element tree.
+        """
         # Build a lookup for parentId resolution
-        object_number_to_calm_id = self._build_object_number_lookup(root)
+        object_number_to_calm_id = self._build_object_number_lookup(self._iter_records(xml_source))
 
-        records = {}
-        for record_element in root.iter('record'):
-            iaid_elem = record_element.find("Alternative_number/[alternative_number.type='CALM RecordID']/alternative_number")
+        for record_element in self._iter_records(xml_source):
+            # Perform transformations directly on the record's subtree
+            self._transform_elements(record_element)
+
+            iaid_elem = record_element.find(_IAID_PATH)
             iaid = iaid_elem.text if iaid_elem is not None else None
             
             if not iaid:
                 continue
 
-            record_data = self._process_record(record_element, object_number_to_calm_id)
+            # The IAID predicate path is the costliest lookup, so it is evaluated once
+            record_data = self._process_record(record_element, object_number_to_calm_id, iaid=iaid.strip())
             
             if self.remove_empty_fields:
                 cleaned_record = self._clean_none({"record": record_data})
-                records[iaid] = cleaned_record if cleaned_record else {"record": {}}
+                yield iaid, cleaned_record if cleaned_record else {"record": {}}
             else:
-                records[iaid] = {"record": record_data}
-        
-        return records
-
-    def _transform_record_types(self, root: ET.Element):
-        for record_type in root.iter('record_type'):
-            neutral_value = record_type.find("./value[@lang='neutral']")
-            if neutral_value is not None and neutral_value.text:
-                key = neutral_value.text.strip()
-                if key in self.record_level_mapping:
-                    neutral_value.text = str(self.record_level_mapping[key])
-
-    def _transform_client_filepaths(self, root: ET.Element):
-        for client_filepath in root.iter('client_filepath'):
-            if client_filepath.text:
-                client_filepath.text = "Original filepath:" + client_filepath.text.strip()
-
-    def _transform_dates(self, root: ET.Element):
-        date_pattern = r"(\d{4})-(\d{2})-(\d{2})"
-        replacement_pattern = r"\1\2\3"
-        for date_element in root.iter('dating.date.start'):
-            if date_element.text:
-                date_element.text = re.sub(date_pattern, replacement_pattern, date_element.text)
-        for date_element in root.iter('dating.date.end'):
-            if date_element.text:
-                date_element.text = re.sub(date_pattern, replacement_pattern, date_element.text)
-
-    def _transform_languages(self, root: ET.Element):
-        for language in root.iter('inscription.language'):
-            if language.text:
-                languages = [lang.strip() for lang in language.text.split(';')]
-                if len(languages) > 1:
-                    language.text = ', '.join(sorted(languages[:-1])) + ' and ' + languages[-1]
-
-    def _build_object_number_lookup(self, root: ET.Element) -> Dict[str, str]:
+                yield iaid, {"record": record_data}
+
+    @staticmethod
+    def _iter_records(xml_source: Union[str, bytes, os.PathLike]) -> Iterator[ET.Element]:
+        """Yields each complete <record> element, clearing it once the consumer moves on."""
+        if isinstance(xml_source, str):
+            xml_source = io.StringIO(xml_source)
+        elif isinstance(xml_source, bytes):
+            xml_source = io.BytesIO(xml_source)
+        for _, elem in ET.iterparse(xml_source, events=('end',)):
+            if elem.tag == 'record':
+                yield elem
+                elem.clear()
+
+    def _transform_elements(self, root: ET.Element):
+        """Apply the per-tag text transforms to root's subtree in a single walk."""
+        handlers = self._element_handlers
+        for elem in root.iter():
+            handler = handlers.get(elem.tag)
+            if handler is not None:
+                handler(elem)
+
+    def _transform_record_type(self, record_type: ET.Element):
+        neutral_value = record_type.find("./value[@lang='neutral']")
+        if neutral_value is not None and neutral_value.text:
+            key = neutral_value.text.strip()
+            if key in self.record_level_mapping:
+                neutral_value.text = str(self.record_level_mapping[key])
+
+    def _transform_client_filepath(self, client_filepath: ET.Element):
+        if client_filepath.text:
+            client_filepath.text = "Original filepath:" + client_filepath.text.strip()
+
+    @staticmethod
+    def _compact_date(text: str) -> str:
+        """Remove the hyphens from every YYYY-MM-DD date in text."""
+        if '-' not in text:
+            return text
+        # A bare date is by far the most common value; slice it without the regex engine
+        if (len(text) == 10 and text[4] == '-' and text[7] == '-'
+                and text[:4].isdecimal() and text[5:7].isdecimal() and text[8:].isdecimal()):
+            return text[:4] + text[5:7] + text[8:]
+        return _DATE_RE.sub(r"\1\2\3", text)
+
+    def _transform_date(self, date_element: ET.Element):
+        if date_element.text:
+            date_element.text = self._compact_date(date_element.text)
+
+    def _transform_language(self, language: ET.Element):
+        text = language.text
+        # A single language is left exactly as it is
+        if not text or ';' not in text:
+            return
+        # Two languages are the common case and need no list or sort
+        first, _, rest = text.partition(';')
+        if ';' not in rest:
+            language.text = first.strip() + ' and ' + rest.strip()
+            return
+        languages = [lang.strip() for lang in text.split(';')]
+        language.text = ', '.join(sorted(languages[:-1])) + ' and ' + languages[-1]
+
+    @staticmethod
+    def _date_year(text: str) -> Optional[str]:
+        """Year of a YYYY-MM-DD date, or None if text is not a valid date in that format."""
+        # The usual zero-padded form is validated without parsing a format string
+        if (len(text) == 10 and text[4] == '-' and text[7] == '-'
+                and text[:4].isdecimal() and text[5:7].isdecimal() and text[8:].isdecimal()):
+            try:
+                date(int(text[:4]), int(text[5:7]), int(text[8:]))
+            except ValueError:
+                return None
+            return text[:4]
+        try:
+            return datetime.strptime(text, "%Y-%m-%d").strftime("%Y")
+        except ValueError:
+            return None
+
+    def _build_object_number_lookup(self, records: Iterable[ET.Element]) -> Dict[str, str]:
         lookup = {}
-        for record in root.iter('record'):
+        for record in records:
             obj_num_elem = record.find("object_number")
-            calm_id_elem = record.find("Alternative_number/[alternative_number.type='CALM RecordID']/alternative_number")
+            calm_id_elem = record.find(_IAID_PATH)
             if obj_num_elem is not None and obj_num_elem.text and calm_id_elem is not None and calm_id_elem.text:
                 lookup[obj_num_elem.text] = calm_id_elem.text
         return lookup
 
-    def _process_record(self, record: ET.Element, obj_num_lookup: Dict[str, str]) -> Dict[str, Any]:
-        """Extracts and structures data from a single <record> element."""
+    def _process_record(self, record: ET.Element, obj_num_lookup: Dict[str, str],
+                        iaid: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extracts and structures data from a single <record> element.
+
+        iaid, if given, is the record's already stripped IAID text and is not looked up again.
+        """
         
+        # First child per tag, gathered in one pass: most fields are single direct children,
+        # and dotted tags like "institution.name" would otherwise go through ElementPath
+        first_child = {}
+        for child in record:
+            first_child.setdefault(child.tag, child)
+
         def get_text(path: str, root=record) -> Optional[str]:
-            elem = root.find(path)
-            return elem.text.strip() if elem is not None and elem.text else None
+            if root is record and '/' not in path and '[' not in path:
+                elem = first_child.get(path)
+                text = elem.text if elem is not None else None
+            else:
+                # findtext returns the text directly ('' for an empty element)
+                text = root.findtext(path)
+            return text.strip() if text else None
 
         def get_all_text(path: str, root=record) -> list[str]:
-            return [elem.text.strip() for elem in root.findall(path) if elem.text]
+            return [text.strip() for text in (elem.text for elem in root.findall(path)) if text]
 
-        iaid = get_text("Alternative_number/[alternative_number.type='CALM RecordID']/alternative_number")
+        if iaid is None:
+            iaid = get_text(_IAID_PATH)
         citable_reference = get_text("object_number")
         
         part_of_reference = get_text("Part_of/part_of_reference")
@@ -161,13 +258,9 @@ class XMLConverterLogic:
         covering_to_date = int(covering_to_date_str) if covering_to_date_str else None
 
         held_by_info = get_text("institution.name")
-        held_by = []
-        if held_by_info == "The National Archives, Kew":
-            held_by = [{"xReferenceId": "A13530124", "xReferenceCode": "66", "xReferenceName": "The National Archives, Kew"}]
-        elif held_by_info == "UK Parliament":
-            held_by = [{"xReferenceId": "A13531051", "xReferenceCode": "61", "xReferenceName": "UK Parliament"}]
-        elif held_by_info == "British Film Institute (BFI) National Archive":
-            held_by = [{"xReferenceId": "A13532152", "xReferenceCode": "2870", "xReferenceName": "British Film Institute (BFI) National Archive"}]
+        held_by_ref = _HELD_BY.get(held_by_info)
+        # Copied, since later pipeline steps edit records in place
+        held_by = [dict(held_by_ref)] if held_by_ref else []
 
         closure_status_val = get_text("access_status/value[@lang='neutral']")
         closure_status, closure_code, closure_type, record_opening_date = None, None, None, None
@@ -181,11 +274,10 @@ class XMLConverterLogic:
             if closure_status == 'D':
                 closed_until = get_text("closed_until")
                 if closed_until:
-                    try:
-                        closure_code = ET.datetime.strptime(closed_until, "%Y-%m-%d").strftime("%Y")
+                    closure_code = self._date_year(closed_until)
+                    if closure_code:
                         record_opening_date = closed_until
-                    except ValueError:
-                        pass # Keep as None if format is wrong
+                    # Both stay None if the format is wrong
                 closure_type = 'U'
 
             if held_by_info == "UK Parliament":
@@ -217,8 +309,13 @@ class XMLConverterLogic:
         physical_description_extent = extent_descriptions[0][0] if extent_descriptions else None
         physical_description_form = '; '.join([f"{v} {f}".strip() for v, f in extent_descriptions]) if extent_descriptions else None
 
-        reference_part_match = re.search(r"([^\/]+$)", citable_reference) if citable_reference else None
-        reference_part = reference_part_match.group(1) if reference_part_match else None
+        # Fields used more than once below, looked up once
+        catalogue_id = get_text("catid")
+        existence_of_originals = get_text("existence_of_originals")
+        related_material = get_text("related_material.free_text")
+
+        # Text after the last slash; None when empty, as when the reference ends in a slash
+        reference_part = (citable_reference.rpartition('/')[2] or None) if citable_reference else None
 
         record_data = {
             "iaid": iaid,
@@ -228,7 +325,7 @@ class XMLConverterLogic:
             "accessConditions": access_conditions,
             "administrativeBackground": get_text("admin_history"),
             "arrangement": arrangement,
-            "catalogueId": int(get_text("catid")) if get_text("catid") else None,
+            "catalogueId": int(catalogue_id) if catalogue_id else None,
             "catalogueLevel": catalogue_level,
             "coveringFromDate": covering_from_date,
             "coveringToDate": covering_to_date,
@@ -247,12 +344,12 @@ class XMLConverterLogic:
             "heldBy": held_by,
             "language": get_text("Inscription//inscription.language"),
             "legalStatus": get_text("legal_status/value[@lang='0']"),
-            "locationOfOriginals": [{"xReferenceDescription": get_text("existence_of_originals")}] if get_text("existence_of_originals") else [],
+            "locationOfOriginals": [{"xReferenceDescription": existence_of_originals}] if existence_of_originals else [],
             "physicalDescriptionExtent": physical_description_extent,
             "physicalDescriptionForm": physical_description_form,
             "referencePart": reference_part,
             "publicationNote": get_all_text("publication_note"),
-            "relatedMaterial": [{"description": get_text("related_material.free_text")}] if get_text("related_material.free_text") else [],
+            "relatedMaterial": [{"description": related_material}] if related_material else [],
             "separatedMaterial": [],
             "restrictionsOnUse": "This record is not currently accessible in a playable format and is unavailable for public viewing" if not digitised and held_by_info == "British Film Institute (BFI) National Archive" else None,
             "scopeContent": {"description": get_text("Content_description/content.description")},
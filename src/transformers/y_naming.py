@@ -1,12 +1,23 @@
 """
 Y-naming transformer
 """
+import functools
 import re
-import copy
 import logging
-from typing import Any, Dict, Optional, List
+from copy import deepcopy
+from typing import Any, Dict, Optional, List, Tuple
 
-from .base import BaseTransformer
+from .base import BaseTransformer, walk_strings
+
+# Everything dropped when normalising a string for reference comparison
+_NON_ALNUM_RE = re.compile(r'[^a-zA-Z0-9]')
+
+# The same class as a bytes deletion table, used for ASCII-only strings
+_ASCII_NON_ALNUM = bytes(c for c in range(128) if not chr(c).isalnum())
+
+# Distinct strings whose reference check is remembered per YNamingLogic; archival
+# records repeat the same codes and references many times over
+REF_CACHE_SIZE = 65536
 
 
 class YNamingTransformer(BaseTransformer):
@@ -40,7 +51,7 @@ class YNamingTransformer(BaseTransformer):
         # in the original implementation's context.
         transformer = YNamingLogic(target_columns=target_fields, ref_set=None)
         
-        return transformer.transform(data)
+        return transformer.transform(data, copy=False)
 
 
 class YNamingLogic:
@@ -54,16 +65,30 @@ class YNamingLogic:
         self.logger = logging.getLogger("pipeline.transformers.y_naming")
         self.target_columns = target_columns
         self.backup_original = backup_original
+        # Paths with a malformed index could never match, so they are dropped up front
+        self._parsed_columns = [
+            steps for steps in map(self._parse_field_path, target_columns or ())
+            if steps is not None
+        ]
         self._refs = None
         if ref_set is not None:
-            self._refs = {self._normalize(r) for r in ref_set}
+            # Frozen, since the memoised reference check relies on the set never changing
+            self._refs = frozenset(self._normalize(r) for r in ref_set)
+        # Normalising never lengthens a string, so anything shorter than the shortest
+        # reference cannot match and skips normalisation entirely
+        self._min_ref_len = min(map(len, self._refs or ()), default=0)
+        # The reference set is fixed for the instance, so results never go stale
+        self._is_ref = functools.lru_cache(maxsize=REF_CACHE_SIZE)(self._matches_ref)
         self._fitted = True
 
     def _normalize(self, s: str) -> str:
         """Normalize a string for comparison."""
         if not isinstance(s, str):
             return ""
-        return re.sub(r'[^a-zA-Z0-9]', '', s).lower()
+        if s.isascii():
+            # bytes.translate deletes through a lookup table in C, about 3x faster than re.sub
+            return s.encode('ascii').translate(None, _ASCII_NON_ALNUM).lower().decode('ascii')
+        return _NON_ALNUM_RE.sub('', s).lower()
 
     def _is_y_named(self, s: str) -> bool:
         """Check if a string follows the Y naming convention."""
@@ -71,23 +96,15 @@ class YNamingLogic:
             return False
         return s.startswith('Y') and s[1:].isdigit()
 
-    def _walk_and_transform(self, obj: Any, json_id: Optional[int] = None) -> Any:
-        """Recursively walk dict/list and transform all string values in-place."""
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                obj[k] = self._walk_and_transform(v, json_id)
-        elif isinstance(obj, list):
-            for i, v in enumerate(obj):
-                obj[i] = self._walk_and_transform(v, json_id)
-        elif isinstance(obj, str):
-            return self._transform_string(obj, json_id)
-        return obj
+    def _matches_ref(self, s: str) -> bool:
+        """Whether a string normalises to one of the references."""
+        return self._normalize(s) in self._refs
 
     def _transform_string(self, s: str, json_id: Optional[int] = None) -> str:
         """Apply Y-naming if the string is in the reference set."""
-        if self._refs is None:
+        if not self._refs or len(s) < self._min_ref_len:
             return s
-        if self._normalize(s) in self._refs:
+        if self._is_ref(s):
             # This part of the logic that generates a new Y-name is not fully
             # implemented in the original code, as it depends on a 'y_namer' object
             # that is not available here.
@@ -95,23 +112,39 @@ class YNamingLogic:
             self.logger.info(f"Y-naming match found for: {s}")
         return s
 
-    def _transform_field(self, obj: Any, field_path: str, json_id: Optional[int] = None) -> None:
-        """Transform a single field specified by its path."""
-        parts = field_path.split('.')
-        cur = obj
-        for i, part in enumerate(parts):
+    @staticmethod
+    def _parse_field_path(field_path: str) -> Optional[List[Tuple[str, Optional[int]]]]:
+        """Split a dotted path into (key, index) steps; None if an index is malformed."""
+        steps = []
+        for part in field_path.split('.'):
             if '[' in part and part.endswith(']'):
-                name, idx_str = part[:-1].split('[')
                 try:
-                    idx = int(idx_str)
+                    name, idx_str = part[:-1].split('[')
+                    steps.append((name, int(idx_str)))
                 except ValueError:
-                    return
-                
+                    return None
+            else:
+                steps.append((part, None))
+        return steps
+
+    def _transform_field(self, obj: Any, field_path: str, json_id: Optional[int] = None) -> None:
+        """Transform a single field specified by its path."""
+        steps = self._parse_field_path(field_path)
+        if steps is not None:
+            self._transform_parsed(obj, steps, json_id)
+
+    def _transform_parsed(self, obj: Any, steps: List[Tuple[str, Optional[int]]],
+                          json_id: Optional[int] = None) -> None:
+        """Transform the field at an already parsed path."""
+        cur = obj
+        last = len(steps) - 1
+        for i, (name, idx) in enumerate(steps):
+            if idx is not None:
                 if name:
                     cur = cur.get(name) if isinstance(cur, dict) else None
                 
                 if isinstance(cur, list) and 0 <= idx < len(cur):
-                    if i == len(parts) - 1:
+                    if i == last:
                         if isinstance(cur[idx], str):
                             cur[idx] = self._transform_string(cur[idx], json_id)
                     else:
@@ -119,23 +152,27 @@ class YNamingLogic:
                 else:
                     return
             else:
-                if i == len(parts) - 1:
-                    if isinstance(cur, dict) and part in cur and isinstance(cur[part], str):
-                        cur[part] = self._transform_string(cur[part], json_id)
+                if i == last:
+                    if isinstance(cur, dict) and name in cur and isinstance(cur[name], str):
+                        cur[name] = self._transform_string(cur[name], json_id)
                 else:
-                    cur = cur.get(part) if isinstance(cur, dict) else None
+                    cur = cur.get(name) if isinstance(cur, dict) else None
             
             if cur is None:
                 return
 
-    def transform(self, data: Any, json_id: Optional[int] = None, **kwargs) -> Any:
-        """Transform a JSON-like object."""
-        obj = copy.deepcopy(data)
+    def transform(self, data: Any, json_id: Optional[int] = None, copy: bool = True, **kwargs) -> Any:
+        """Transform a JSON-like object; with copy=False, data is modified in place."""
+        obj = deepcopy(data) if copy else data
+
+        # Without references no string can change, so there is nothing to walk
+        if not self._refs:
+            return obj
 
         if self.target_columns:
-            for field in self.target_columns:
-                self._transform_field(obj, field, json_id)
+            for steps in self._parsed_columns:
+                self._transform_parsed(obj, steps, json_id)
         else:
-            self._walk_and_transform(obj, json_id)
+            walk_strings(obj, functools.partial(self._transform_string, json_id=json_id))
         
         return obj
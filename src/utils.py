@@ -12,7 +12,7 @@ from __future__ import annotations
 import os
 from pathlib import Path
 import xml.etree.ElementTree as ET
-from typing import Iterable, List, Optional, Sequence, Union
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from dotenv import load_dotenv
 import contextlib
 import time
@@ -384,19 +384,41 @@ def filter_xml_by_iaid(xml_path: Union[str, Path], target_iaid: str, output_path
 ############################
 # transfer register helpers
 ############################
+# Parsed transfer registers kept across warm invocations: (bucket, key) -> (etag, register)
+_REGISTER_CACHE: Dict[Tuple[str, str], Tuple[str, dict]] = {}
+
+
 def load_transfer_register(register_filename, s3, bucket, s3_output_folder, logger):
-    """Load the transfer register (previously called manifest) from S3."""
+    """Load the transfer register (previously called manifest) from S3.
+
+    A HEAD request checks the ETag first; if it matches the copy parsed by an earlier
+    invocation in this container, that copy is reused instead of re-downloading.
+    """
     key = f"{s3_output_folder}/{register_filename}"
     try:
+        etag = s3.head_object(Bucket=bucket, Key=key)['ETag']
+        cached = _REGISTER_CACHE.get((bucket, key))
+        if cached is not None and cached[0] == etag:
+            register = cached[1]
+            logger.info("Reusing cached transfer register with %d records", len(register.get('records', {})))
+            return register
+
         response = s3.get_object(Bucket=bucket, Key=key)
         register = json.loads(response['Body'].read().decode('utf-8'))
+        # cache under the ETag of what was actually read, in case it changed since the HEAD
+        _REGISTER_CACHE[(bucket, key)] = (response['ETag'], register)
         logger.info("Loaded transfer register with %d records", len(register.get('records', {})))
         return register
-    except s3.exceptions.NoSuchKey:
-        logger.info("Transfer register file not found, creating new one")
+    except s3.exceptions.ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            logger.info("Transfer register file not found, creating new one")
+        else:
+            logger.exception("Error loading transfer register: %s", e)
+        _REGISTER_CACHE.pop((bucket, key), None)
         return {"last_updated": None, "total_records": 0, "records": {}}
     except Exception as e:
         logger.exception("Error loading transfer register: %s", e)
+        _REGISTER_CACHE.pop((bucket, key), None)
         return {"last_updated": None, "total_records": 0, "records": {}}
 
 def save_transfer_register(register_filename, s3, bucket, output_dir, register, logger):
@@ -420,14 +442,19 @@ def save_transfer_register(register_filename, s3, bucket, output_dir, register,
         register['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         register['total_records'] = len(register.get('records', {}))
         body = json.dumps(register, indent=2, ensure_ascii=False).encode('utf-8')
-        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/json')
+        response = s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/json')
+        # The in-memory register now matches S3, so the next load can reuse it
+        _REGISTER_CACHE[(bucket, key)] = (response['ETag'], register)
         logger.info("Saved transfer register with %d total records to s3://%s/%s", register['total_records'], bucket, key)
     except Exception as e:
+        # The cached copy may hold unsaved changes; force the next load to re-read S3
+        _REGISTER_CACHE.pop((bucket, key), None)
         logger.exception("Error saving transfer register: %s", e)
 
 def filter_new_records(records, transfer_register, logger):
     """Filter out already-uploaded records using transfer register"""
-    uploaded_iaids = set(transfer_register.get('records', {}).keys())
+    # membership against the records dict is already O(1); no need to copy its keys into a set
+    uploaded_iaids = transfer_register.get('records', {})
     new_records = {}
     skipped_count = 0
 
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+
+# Add project root to PYTHONPATH so 'src' can be imported when running pytest from repo root.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.config_loader import UniversalConfig
+
+
+def _config(tmp_path, yaml_text, json_data):
+    (tmp_path / "config.yaml").write_text(yaml_text)
+    (tmp_path / "config.json").write_text(json.dumps(json_data))
+    return UniversalConfig(yaml_file="config.yaml", json_file="config.json", base_path=tmp_path)
+
+
+def test_nested_yaml_value_wins_over_json(tmp_path):
+    config = _config(tmp_path, "aws:\n  bucket: from-yaml\n", {"aws.bucket": "from-json"})
+    assert config.get("aws.bucket") == "from-yaml"
+
+
+def test_empty_nested_mapping_falls_through_to_json(tmp_path):
+    config = _config(tmp_path, "aws:\n  bucket: {}\n", {"aws.bucket": "from-json"})
+    assert config.get("aws.bucket") == "from-json"
+
+
+def test_empty_nested_mapping_falls_through_to_default(tmp_path):
+    config = _config(tmp_path, "aws:\n  bucket: {}\n", {})
+    assert config.get("aws.bucket", "fallback") == "fallback"
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+# Add project root to PYTHONPATH so 'src' can be imported when running pytest from repo root.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import lambda_handler
+from src.storage import StorageClient
+
+CONFIG = {
+    "1": {"operation": "convert"},
+    "2": {"operation": "newline_to_p", "target_fields": None, "match": "\n+"},
+}
+
+
+def _record_xml(iaid, description):
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<adlibXML><recordList><record>
+  <object_number>PARL/1/{iaid}</object_number>
+  <Alternative_number><alternative_number.type>CALM RecordID</alternative_number.type><alternative_number>{iaid}</alternative_number></Alternative_number>
+  <record_type><value lang="neutral">ITEM</value></record_type>
+  <Title><title>Item {iaid}</title></Title>
+  <Content_description><content.description>{description}</content.description></Content_description>
+  <institution.name>UK Parliament</institution.name>
+</record></recordList></adlibXML>"""
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Local filesystem StorageClient rooted at tmp_path, holding two XML inputs."""
+    storage = StorageClient.__new__(StorageClient)
+    storage.local_mode = True
+    storage.local_root = tmp_path
+    storage.s3_client = None
+    monkeypatch.setattr(lambda_handler, 'storage_client', storage)
+
+    inputs = tmp_path / 'bkt' / 'xml_input'
+    inputs.mkdir(parents=True)
+    (inputs / 'first.xml').write_text(_record_xml('A1', "One\nTwo"))
+    (inputs / 'second.xml').write_text(_record_xml('A2', "Three\n\nFour"))
+    return storage
+
+
+def test_batch_matches_per_step_outputs(storage, tmp_path):
+    keys = ['xml_input/first.xml', 'xml_input/second.xml']
+    result = lambda_handler.transformations(
+        {'bucket': 'bkt', 'keys': keys, 'transformation_config': CONFIG, 'execution_id': 'batch'},
+        None
+    )
+
+    assert result['statusCode'] == 200
+    assert result['output_keys'] == [
+        'processed/batch/step_2/first.json',
+        'processed/batch/step_2/second.json',
+    ]
+
+    for key in keys:
+        previous = None
+        for step in (1, 2):
+            event = {
+                'bucket': 'bkt',
+                'key': key,
+                'transformation_index': step,
+                'transformation_config': CONFIG,
+                'execution_id': 'steps',
+            }
+            if previous is not None:
+                event['input_key'] = previous['output_key']
+            previous = lambda_handler.transformations(event, None)
+            assert previous['statusCode'] == 200
+
+        filename = os.path.basename(key).replace('.xml', '.json')
+        batch_output = (tmp_path / 'bkt' / 'processed' / 'batch' / 'step_2' / filename).read_bytes()
+        step_output = (tmp_path / 'bkt' / previous['output_key']).read_bytes()
+        assert batch_output == step_output
+        assert b'<p>' in batch_output
+
+
+def test_batch_failure_waits_for_earlier_uploads(storage, tmp_path):
+    keys = ['xml_input/first.xml', 'xml_input/missing.xml']
+    result = lambda_handler.transformations(
+        {'bucket': 'bkt', 'keys': keys, 'transformation_config': CONFIG, 'execution_id': 'failed'},
+        None
+    )
+
+    assert result['statusCode'] == 500
+    assert (tmp_path / 'bkt' / 'processed' / 'failed' / 'step_2' / 'first.json').exists()
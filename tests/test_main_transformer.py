@@ -0,0 +1,77 @@
+import io
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add project root to PYTHONPATH so 'src' can be imported when running pytest from repo root.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.main_transformer import TransformerOrchestrator
+from src.transformers import BaseTransformer
+
+
+class AppendTransformer(BaseTransformer):
+    """Appends (config value, context step) so the run order is visible in the output."""
+
+    def execute(self, data, config, context):
+        return data + [(config['value'], context['step'])]
+
+
+def _orchestrator():
+    orchestrator = TransformerOrchestrator()
+    orchestrator.registry = {'append': AppendTransformer}
+    return orchestrator
+
+
+def test_pipeline_runs_steps_in_numeric_order():
+    config = {
+        '10': {'operation': 'append', 'value': 'c'},
+        '2': {'operation': 'append', 'value': 'b'},
+        '1': {'operation': 'append', 'value': 'a'},
+    }
+    context = {}
+    result = _orchestrator().compile_pipeline(config)([], context)
+
+    assert result == [('a', 1), ('b', 2), ('c', 10)]
+    assert context['step'] == 10
+
+
+def test_pipeline_rejects_missing_operation():
+    with pytest.raises(ValueError, match="Step 2"):
+        _orchestrator().compile_pipeline({'1': {'operation': 'append'}, '2': {}})
+
+
+def test_pipeline_rejects_unknown_operation():
+    with pytest.raises(ValueError, match="Unknown operation 'missing'"):
+        _orchestrator().compile_pipeline({'1': {'operation': 'missing'}})
+
+
+class VersionedS3:
+    """get_object returns a body tagged with how many GETs have been made."""
+
+    def __init__(self):
+        self.gets = 0
+
+    def get_object(self, Bucket, Key):
+        self.gets += 1
+        return {'Body': io.BytesIO(f'{{"replicaId": "r{self.gets}"}}'.encode())}
+
+
+def test_replica_metadata_cache_is_reset_per_execution():
+    orchestrator = TransformerOrchestrator()
+    storage = SimpleNamespace(s3_client=VersionedS3())
+    config = {'operation': 'replica_metadata', 'bucket': 'replicas'}
+
+    def run(execution_id):
+        record = {'record': {'iaid': 'A1'}}
+        context = {'storage': storage, 'execution_id': execution_id}
+        return orchestrator.transform(record, config, context)['record']['replicaId']
+
+    assert run('exec-1') == 'r1'
+    assert run('exec-1') == 'r1'
+    assert run('exec-2') == 'r2'
+    assert storage.s3_client.gets == 2
@@ -0,0 +1,44 @@
+import math
+import os
+import sys
+from datetime import datetime
+
+# Add project root to PYTHONPATH so 'src' can be imported when running pytest from repo root.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.transformers.newline_to_p import NewlineToPLogic
+
+PAYLOADS = [
+    {"record": {"title": "a\nb", "notes": ["x\r\ny", "z\rw", 3, None, True], "n": 1.5}},
+    {"a\nb": "x", "a<p>b": "y"},  # keys that would collide if rewritten
+    {"key\r": "v\n"},  # CR in a key
+    {"path": "C:\\new\\nested", "text": "line\nline"},  # escaped backslashes
+    ["top\nlevel", {"deep": [["in\nner"]]}],
+]
+
+
+def test_bulk_mode_matches_walker():
+    walker = NewlineToPLogic(match="\n", replace="<p>")
+    bulk = NewlineToPLogic(match="\n", replace="<p>", bulk_mode=True)
+    assert bulk._bulk is not None
+    for payload in PAYLOADS:
+        assert bulk.transform(payload) == walker.transform(payload), payload
+
+
+def test_bulk_mode_keeps_colliding_keys():
+    result = NewlineToPLogic(bulk_mode=True).transform({"a\nb": "x", "a<p>b": "y"})
+    assert result == {"a\nb": "x", "a<p>b": "y"}
+
+
+def test_copy_keeps_non_json_values():
+    stamp = datetime(2024, 1, 2, 3, 4, 5)
+    data = {"text": "a\nb", "when": stamp, "span": (1, 2), "ratio": float("nan")}
+    result = NewlineToPLogic().transform(data)
+
+    assert result["text"] == "a<p>b"
+    assert result["when"] == stamp
+    assert result["span"] == (1, 2)
+    assert math.isnan(result["ratio"])
+    assert data["text"] == "a\nb"
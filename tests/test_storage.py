@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import tarfile
+from unittest import mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+# Add project root to PYTHONPATH so 'src' can be imported when running pytest from repo root.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.storage import S3MultipartWriter, StorageClient
+
+
+class FakeS3:
+    """Records multipart upload calls instead of talking to S3."""
+
+    def __init__(self):
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'upload-1'}
+
+    def upload_part(self, **kwargs):
+        self.parts[kwargs['PartNumber']] = kwargs['Body']
+        return {'ETag': f"etag-{kwargs['PartNumber']}"}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.completed = kwargs['MultipartUpload']['Parts']
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+    def body(self):
+        return b''.join(self.parts[n] for n in sorted(self.parts))
+
+
+def test_streamed_tarball_is_split_into_parts():
+    s3 = FakeS3()
+    payloads = {f"file_{i}.json": os.urandom(3000) for i in range(4)}
+
+    with S3MultipartWriter(s3, 'bucket', 'out.tar.gz', part_size=1024) as writer:
+        with tarfile.open(fileobj=writer, mode="w|gz") as tar:
+            for name, data in payloads.items():
+                ti = tarfile.TarInfo(name=name)
+                ti.size = len(data)
+                tar.addfile(ti, fileobj=io.BytesIO(data))
+
+    assert len(s3.parts) > 1
+    assert all(len(s3.parts[n]) == 1024 for n in sorted(s3.parts)[:-1])
+    assert [p['PartNumber'] for p in s3.completed] == sorted(s3.parts)
+    with tarfile.open(fileobj=io.BytesIO(s3.body())) as tar:
+        assert {m.name: tar.extractfile(m).read() for m in tar} == payloads
+
+
+def test_exception_aborts_upload():
+    s3 = FakeS3()
+
+    with pytest.raises(RuntimeError):
+        with S3MultipartWriter(s3, 'bucket', 'out.bin') as writer:
+            writer.write(b'partial')
+            raise RuntimeError("boom")
+
+    assert s3.aborted
+    assert s3.completed is None
+
+
+def test_empty_object_uploads_single_part():
+    s3 = FakeS3()
+
+    with S3MultipartWriter(s3, 'bucket', 'empty.bin'):
+        pass
+
+    assert s3.parts == {1: b''}
+    assert len(s3.completed) == 1
+
+
+class ErroringHeadS3:
+    """head_object always fails with the given S3 error code."""
+
+    def __init__(self, code):
+        self.code = code
+
+    def head_object(self, **kwargs):
+        raise ClientError({'Error': {'Code': self.code}}, 'HeadObject')
+
+
+def _s3_storage(s3_client):
+    storage = StorageClient.__new__(StorageClient)
+    storage.local_mode = False
+    storage.local_root = None
+    storage.s3_client = s3_client
+    return storage
+
+
+def test_head_object_missing_key_is_false():
+    assert _s3_storage(ErroringHeadS3('404')).head_object('bucket', 'missing.json') is False
+
+
+def test_head_object_access_denied_propagates():
+    with pytest.raises(ClientError):
+        _s3_storage(ErroringHeadS3('403')).head_object('bucket', 'secret.json')
+
+
+class PagedListS3:
+    """list_objects_v2 paginator that returns the given keys over several pages."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_paginator(self, operation):
+        assert operation == 'list_objects_v2'
+        return self
+
+    def paginate(self, **kwargs):
+        for keys in self.pages:
+            yield {'Contents': [{'Key': key} for key in keys]} if keys else {}
+
+
+def test_list_objects_follows_every_page():
+    pages = [[f"p/{i}.json" for i in range(1000)], ["p/1000.json", "p/notes.txt"], []]
+    storage = _s3_storage(PagedListS3(pages))
+
+    assert len(storage.list_objects('bucket', 'p/')) == 1002
+    assert len(storage.list_objects('bucket', 'p/', suffix='.json')) == 1001
+
+
+def test_storage_methods_can_be_patched_on_the_class():
+    storage = _s3_storage(None)
+    with mock.patch.object(StorageClient, 'get_object', return_value=b'{}') as get_object:
+        assert storage.get_object('bucket', 'key.json') == b'{}'
+    get_object.assert_called_once_with('bucket', 'key.json')
@@ -0,0 +1,36 @@
+import os
+import sys
+
+# Add project root to PYTHONPATH so 'src' can be imported when running pytest from repo root.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.transformers.xml_converter import XMLConverterLogic
+
+
+def _closed_item_xml(closed_until):
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<adlibXML><recordList><record>
+  <object_number>PARL/1/2</object_number>
+  <Alternative_number><alternative_number.type>CALM RecordID</alternative_number.type><alternative_number>A200</alternative_number></Alternative_number>
+  <record_type><value lang="neutral">ITEM</value></record_type>
+  <access_status><value lang="neutral">CLOSED</value></access_status>
+  <closed_until>{closed_until}</closed_until>
+  <institution.name>The National Archives, Kew</institution.name>
+</record></recordList></adlibXML>"""
+
+
+def test_closed_item_gets_opening_year():
+    record = XMLConverterLogic().convert(_closed_item_xml("2041-01-01"))["A200"]["record"]
+    assert record["closureStatus"] == "D"
+    assert record["closureCode"] == "2041"
+    assert record["recordOpeningDate"] == "2041-01-01"
+    assert record["closureType"] == "U"
+
+
+def test_closed_item_with_invalid_date_has_no_opening_date():
+    record = XMLConverterLogic().convert(_closed_item_xml("2041-02-30"))["A200"]["record"]
+    assert record["closureStatus"] == "D"
+    assert "closureCode" not in record
+    assert "recordOpeningDate" not in record
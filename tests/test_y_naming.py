@@ -1,3 +1,6 @@
+import math
+from datetime import date
+
 import pytest
 
 import sys, os
@@ -8,6 +11,7 @@ if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
 from src.transformers import YNamingTransformer
+from src.transformers.y_naming import YNamingLogic
 
 # Test matrix for _is_reference_like (syntactic detection only)
 REFERENCE_TESTS = {
@@ -99,3 +103,14 @@ def test_whitespace_embedded_cases():
     # Embedded transformation behavior
     assert t.apply_if_reference("ABC/1 DEF") == "YABC/1 DEF"
     assert t.apply_if_reference("ABC/1/ DEF") == "ABC/1/ DEF"
+
+
+def test_transform_copy_keeps_non_json_values():
+    data = {"ref": "ABC/1", "when": date(2024, 1, 2), "span": (1, 2), "ratio": float("nan")}
+    result = YNamingLogic(ref_set={"ABC/1"}).transform(data)
+
+    assert result is not data
+    assert result["ref"] == "ABC/1"
+    assert result["when"] == date(2024, 1, 2)
+    assert result["span"] == (1, 2)
+    assert math.isnan(result["ratio"])